@@ -1,7 +1,19 @@
-from flask import Flask, render_template, request
-from scraper import run_scraper
+import json
+import time
+from flask import Flask, Response, jsonify, render_template, request, stream_with_context, url_for
+from werkzeug.utils import secure_filename
+from crawler import iter_crawl
+from doc_store import get_document_store
+from export import iter_zip_stream
+from jobs import DONE, FAILED, JobQueue
+from metrics import METRICS, Metrics
+from project_index import get_project_index
+from scheduler import get_cache_warmer
+from scraper import get_session_pool, iter_projects
 
 app = Flask(__name__)
+job_queue = JobQueue()
+get_session_pool().warm()  # Have cookies ready before the first search
 
 @app.route('/', methods=['GET'])
 def home():
@@ -9,16 +21,100 @@ def home():
 
 @app.route('/search', methods=['POST'])
 def search():
-    # Grab user input from the form
-    keyword = request.form.get('keyword', '').strip()
+    # Grab user input from the form or a JSON body
+    payload = request.get_json(silent=True) or request.form
+    keyword = payload.get('keyword', '').strip()
     if not keyword:
-        return "Please enter a valid keyword."
+        return jsonify({'error': "Please enter a valid keyword."}), 400
 
-    # Run the scraper
-    run_scraper(keyword)
+    # Queue the crawl; identical pending keywords share one job
+    get_cache_warmer().record_search(keyword)
+    job = job_queue.submit(keyword)
+    return jsonify({
+        **job.to_dict(),
+        'status_url': url_for('job_status', job_id=job.id),
+        'results_url': url_for('job_results', job_id=job.id),
+        'export_url': url_for('job_export', job_id=job.id),
+    }), 202
 
-    # Return a simple confirmation
-    return f"Scraping complete for keyword: {keyword}. Check the 'downloads' folder for results."
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': "Unknown job."}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/results', methods=['GET'])
+def job_results(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': "Unknown job."}), 404
+    if job.status == FAILED:
+        return jsonify({**job.to_dict(), 'results': None}), 500
+    if job.status != DONE:
+        return jsonify({**job.to_dict(), 'results': None}), 202
+    return jsonify({**job.to_dict(), 'results': job.results})
+
+@app.route('/api/search', methods=['GET'])
+def api_search():
+    # Answer keyword queries from the local index; `refresh=1` also queues a live crawl that updates it
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': "Please enter a valid keyword."}), 400
+
+    get_cache_warmer().record_search(query)
+    started = time.perf_counter()
+    results = get_project_index().search(query, limit=request.args.get('limit', 50, type=int))
+    response = {'query': query, 'results': results, 'took_ms': (time.perf_counter() - started) * 1000}
+    if request.args.get('refresh', '').lower() in ('1', 'true', 'yes'):
+        job = job_queue.submit(query)
+        response['refresh'] = {**job.to_dict(), 'status_url': url_for('job_status', job_id=job.id)}
+    return jsonify(response)
+
+@app.route('/jobs/<job_id>/export.zip', methods=['GET'])
+def job_export(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': "Unknown job."}), 404
+    if job.status != DONE:
+        return jsonify({**job.to_dict(), 'error': "The job has not finished."}), 409
+
+    # The archive is built while it is sent: no temporary file, bounded memory
+    documents = [doc for result in job.results for doc in result['documents']]
+
+    def generate():
+        with get_session_pool().lease() as session:
+            yield from iter_zip_stream(documents, session, store=get_document_store())
+
+    filename = f"via_{secure_filename(job.keyword) or 'documents'}_{job.id[:8]}.zip"
+    return Response(stream_with_context(generate()), mimetype='application/zip',
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@app.route('/stream', methods=['GET'])
+def stream():
+    # Stream project, procedure and document records as NDJSON while the crawl runs
+    keyword = request.args.get('keyword', '').strip()
+    if not keyword:
+        return jsonify({'error': "Please enter a valid keyword."}), 400
+
+    get_cache_warmer().record_search(keyword)
+    run_metrics = Metrics(parent=METRICS)
+
+    def generate():
+        # The session goes back to the pool when the stream ends or the client disconnects
+        with get_session_pool().lease(run_metrics) as session:
+            records = iter_crawl(iter_projects(keyword, session), session, index=get_project_index(), with_titles=True)
+            for record in records:
+                if record['type'] != 'project_done':
+                    yield json.dumps(record) + "\n"
+        yield json.dumps({'type': 'done', 'keyword': keyword, 'metrics': run_metrics.summary()}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Prometheus text exposition of the process-wide request, cache, parse and crawl metrics
+    return Response(METRICS.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 if __name__ == '__main__':
     # For local testing only
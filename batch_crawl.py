@@ -0,0 +1,355 @@
+"""Crawl many keywords in one resumable batch.
+
+Projects and procedures found by several keywords are fetched once. The
+frontier and everything fetched so far are kept in a SQLite checkpoint, so
+running the same command again after a crash or Ctrl-C resumes where it stopped:
+
+    python batch_crawl.py eolico fotovoltaico agrivoltaico --output results.json
+    python batch_crawl.py --keywords-file nightly.txt --titles --output nightly.json
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from crawler import PROCEDURE, PROJECT, TITLE, crawl_project_page
+from metadata import fetch_document_title
+from metrics import METRICS, Metrics
+from project_index import document_id_from_url, get_project_index
+from scraper import MAX_WORKERS, ListingError, ScraperSession, get_document_links, get_session_pool, iter_projects
+
+logger = logging.getLogger(__name__)
+
+# Constants
+CHECKPOINT_FOLDER = os.path.join("cache", "batch")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS keywords (
+    keyword TEXT PRIMARY KEY,
+    searched_at REAL
+);
+CREATE TABLE IF NOT EXISTS keyword_projects (
+    keyword TEXT NOT NULL,
+    project_url TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (keyword, project_url)
+);
+CREATE TABLE IF NOT EXISTS projects (
+    project_url TEXT PRIMARY KEY,
+    info TEXT,
+    crawled_at REAL
+);
+CREATE TABLE IF NOT EXISTS project_procedures (
+    project_url TEXT NOT NULL,
+    procedure_url TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (project_url, procedure_url)
+);
+CREATE TABLE IF NOT EXISTS procedures (
+    procedure_url TEXT PRIMARY KEY,
+    crawled_at REAL
+);
+CREATE TABLE IF NOT EXISTS documents (
+    url TEXT NOT NULL,
+    procedure_url TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    found_at TEXT NOT NULL,
+    PRIMARY KEY (procedure_url, url)
+);
+CREATE TABLE IF NOT EXISTS titles (
+    doc_id TEXT PRIMARY KEY,
+    title TEXT,
+    fetched_at REAL
+);
+"""
+
+def checkpoint_path_for(keywords: List[str]) -> str:
+    """Return the default checkpoint for a keyword list, so rerunning the same batch resumes it."""
+    digest = hashlib.sha1("\n".join(sorted(keywords)).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(CHECKPOINT_FOLDER, f"batch_{digest}.sqlite")
+
+class BatchCheckpoint:
+    """On-disk frontier and results of a batch crawl.
+
+    Every URL is a primary key, so a project or procedure reached from several
+    keywords is queued once. A row counts as done once its `crawled_at` is set,
+    which happens in the same transaction that stores what it led to.
+    """
+
+    def __init__(self, path: str, keywords: List[str]):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        with self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(SCHEMA)
+            self.conn.executemany("INSERT OR IGNORE INTO keywords (keyword) VALUES (?)", [(k,) for k in keywords])
+        self.keywords = keywords
+
+    def _column(self, sql: str, params: tuple = ()) -> List:
+        return [row[0] for row in self.conn.execute(sql, params)]
+
+    def pending_keywords(self) -> List[str]:
+        searched = set(self._column("SELECT keyword FROM keywords WHERE searched_at IS NOT NULL"))
+        return [keyword for keyword in self.keywords if keyword not in searched]
+
+    def pending_projects(self) -> List[str]:
+        return self._column("SELECT project_url FROM projects WHERE crawled_at IS NULL ORDER BY rowid")
+
+    def pending_procedures(self) -> List[str]:
+        return self._column("SELECT procedure_url FROM procedures WHERE crawled_at IS NULL ORDER BY rowid")
+
+    def pending_titles(self) -> List[str]:
+        fetched = set(self._column("SELECT doc_id FROM titles"))
+        doc_urls = self._column("SELECT DISTINCT url FROM documents ORDER BY rowid")
+        return [url for url in doc_urls if document_id_from_url(url) not in fetched]
+
+    def add_keyword_projects(self, keyword: str, project_urls: List[str]) -> int:
+        """Record a keyword's search results; returns how many projects were not queued yet."""
+        with self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany("INSERT OR IGNORE INTO projects (project_url) VALUES (?)",
+                                  [(url,) for url in project_urls])
+            added = self.conn.total_changes - before
+            self.conn.execute("DELETE FROM keyword_projects WHERE keyword = ?", (keyword,))
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO keyword_projects (keyword, project_url, position) VALUES (?, ?, ?)",
+                [(keyword, url, i) for i, url in enumerate(project_urls)]
+            )
+            self.conn.execute("UPDATE keywords SET searched_at = ? WHERE keyword = ?", (time.time(), keyword))
+        return added
+
+    def add_project(self, project_url: str, procedure_urls: List[str], info: Optional[Dict]) -> int:
+        """Record a crawled project page; returns how many procedures were not queued yet."""
+        procedure_urls = list(dict.fromkeys(procedure_urls))
+        with self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany("INSERT OR IGNORE INTO procedures (procedure_url) VALUES (?)",
+                                  [(url,) for url in procedure_urls])
+            added = self.conn.total_changes - before
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO project_procedures (project_url, procedure_url, position) VALUES (?, ?, ?)",
+                [(project_url, url, i) for i, url in enumerate(procedure_urls)]
+            )
+            self.conn.execute("UPDATE projects SET info = ?, crawled_at = ? WHERE project_url = ?",
+                              (json.dumps(info, ensure_ascii=False), time.time(), project_url))
+        return added
+
+    def add_procedure(self, procedure_url: str, doc_urls: List[str]) -> None:
+        found_at = time.strftime('%Y-%m-%d %H:%M:%S')
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO documents (url, procedure_url, position, found_at) VALUES (?, ?, ?, ?)",
+                [(url, procedure_url, i, found_at) for i, url in enumerate(dict.fromkeys(doc_urls))]
+            )
+            self.conn.execute("UPDATE procedures SET crawled_at = ? WHERE procedure_url = ?",
+                              (time.time(), procedure_url))
+
+    def add_title(self, doc_url: str, title: Optional[str]) -> None:
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO titles (doc_id, title, fetched_at) VALUES (?, ?, ?)",
+                              (document_id_from_url(doc_url), title, time.time()))
+
+    def project_results(self, project_urls: Iterable[str]) -> List[Dict]:
+        """Return crawled projects in the shape of `crawler.crawl_projects` results."""
+        titles = dict(self.conn.execute("SELECT doc_id, title FROM titles"))
+        results = []
+        for project_url in project_urls:
+            row = self.conn.execute("SELECT info FROM projects WHERE project_url = ?", (project_url,)).fetchone()
+            procedure_urls = self._column(
+                "SELECT procedure_url FROM project_procedures WHERE project_url = ? ORDER BY position", (project_url,)
+            )
+            documents = []
+            for procedure_url in procedure_urls:
+                for doc_url, found_at in self.conn.execute(
+                    "SELECT url, found_at FROM documents WHERE procedure_url = ? ORDER BY position", (procedure_url,)
+                ):
+                    doc = {'url': doc_url, 'project_url': project_url, 'procedure_url': procedure_url,
+                           'date_found': found_at}
+                    if titles:
+                        doc['title'] = titles.get(document_id_from_url(doc_url))
+                    documents.append(doc)
+            results.append({
+                'project_url': project_url,
+                'project_info': json.loads(row[0]) if row and row[0] else None,
+                'procedure_urls': procedure_urls,
+                'documents': documents,
+            })
+        return results
+
+    def keyword_projects(self, keyword: str) -> List[str]:
+        return self._column("SELECT project_url FROM keyword_projects WHERE keyword = ? ORDER BY position", (keyword,))
+
+    def all_projects(self) -> List[str]:
+        return self._column("SELECT project_url FROM projects ORDER BY rowid")
+
+    def close(self) -> None:
+        self.conn.close()
+
+def run_tasks(items: List[str], fn: Callable, record: Callable, label: str, stage: str,
+              metrics: Metrics, max_workers: int) -> int:
+    """Run `fn` over `items` on a worker pool, recording each outcome from the calling thread.
+
+    An item whose task raises is not recorded, so it stays pending for the next
+    run. Returns the number of such items.
+    """
+    if not items:
+        return 0
+    logger.info(f"Crawling {len(items)} {label}")
+
+    def timed(item: str):
+        with metrics.timer('via_crawl_task_seconds', stage=stage):
+            return fn(item)
+
+    failed = 0
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {executor.submit(timed, item): item for item in items}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                outcome = future.result()
+            except Exception as e:
+                logger.error(f"Failed to crawl {futures[future]}, left pending: {e}")
+                failed += 1
+            else:
+                record(futures[future], outcome)
+            if done % 100 == 0 or done == len(items):
+                logger.info(f"{done}/{len(items)} {label} done")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return failed
+
+def run_batch(keywords: List[str], checkpoint: BatchCheckpoint, session: ScraperSession,
+              max_workers: int = MAX_WORKERS, with_titles: bool = False) -> Dict[str, int]:
+    """Search every keyword, then crawl the union of their projects, procedures and document titles.
+
+    Each finished step is committed to `checkpoint` before the next is recorded;
+    steps already done in an earlier run are skipped. Keywords, projects,
+    procedures and titles whose pages could not be read stay pending. Returns
+    counts for the run.
+    """
+    stats = {'keywords': 0, 'projects': 0, 'shared_projects': 0, 'procedures': 0,
+             'shared_procedures': 0, 'failed_keywords': 0, 'failed_projects': 0,
+             'failed_procedures': 0, 'titles': 0, 'failed_titles': 0}
+
+    for keyword in checkpoint.pending_keywords():
+        try:
+            project_urls = list(dict.fromkeys(iter_projects(keyword, session, strict=True)))
+        except ListingError as e:
+            logger.error(f"Keyword '{keyword}' left pending: {e}")
+            stats['failed_keywords'] += 1
+            continue
+        added = checkpoint.add_keyword_projects(keyword, project_urls)
+        stats['keywords'] += 1
+        stats['shared_projects'] += len(project_urls) - added
+        logger.info(f"Keyword '{keyword}': {len(project_urls)} projects, {added} not seen in earlier keywords")
+
+    def crawl_project(project_url: str) -> Tuple[List[str], Optional[Dict]]:
+        return crawl_project_page(project_url, session)
+
+    def record_project(project_url: str, outcome: Tuple[List[str], Optional[Dict]]) -> None:
+        procedure_urls, info = outcome
+        if info is None:
+            # Left pending for the next run; scraper has already logged why
+            stats['failed_projects'] += 1
+            return
+        added = checkpoint.add_project(project_url, procedure_urls, info)
+        stats['projects'] += 1
+        stats['shared_procedures'] += len(set(procedure_urls)) - added
+
+    def crawl_procedure(procedure_url: str) -> List[str]:
+        return get_document_links(procedure_url, session, strict=True)
+
+    def record_procedure(procedure_url: str, doc_urls: List[str]) -> None:
+        checkpoint.add_procedure(procedure_url, doc_urls)
+        stats['procedures'] += 1
+
+    def fetch_title(doc_url: str) -> Optional[str]:
+        return fetch_document_title(document_id_from_url(doc_url), session, strict=True)
+
+    def record_title(doc_url: str, title: Optional[str]) -> None:
+        checkpoint.add_title(doc_url, title)
+        stats['titles'] += 1
+
+    stats['failed_projects'] += run_tasks(checkpoint.pending_projects(), crawl_project, record_project,
+                                          "projects", PROJECT, session.metrics, max_workers)
+    stats['failed_procedures'] += run_tasks(checkpoint.pending_procedures(), crawl_procedure, record_procedure,
+                                            "procedures", PROCEDURE, session.metrics, max_workers)
+    if with_titles:
+        stats['failed_titles'] += run_tasks(checkpoint.pending_titles(), fetch_title, record_title,
+                                            "document titles", TITLE, session.metrics, max_workers)
+    return stats
+
+def export_results(checkpoint: BatchCheckpoint, output: Optional[str]) -> Dict[str, List[Dict]]:
+    """Record the batch in the project index and optionally write {keyword: results} as JSON."""
+    index = get_project_index()
+    for result in checkpoint.project_results(checkpoint.all_projects()):
+        index.add_crawl_result(result)
+
+    results = {keyword: checkpoint.project_results(checkpoint.keyword_projects(keyword))
+               for keyword in checkpoint.keywords}
+    if output:
+        tmp_path = f"{output}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, output)
+        logger.info(f"Wrote results for {len(results)} keywords to {output}")
+    return results
+
+def read_keywords(args: argparse.Namespace) -> List[str]:
+    keywords = list(args.keywords)
+    if args.keywords_file:
+        with open(args.keywords_file, encoding="utf-8") as f:
+            keywords.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    return list(dict.fromkeys(" ".join(keyword.split()) for keyword in keywords))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Crawl several keywords as one resumable batch.")
+    parser.add_argument("keywords", nargs="*", help="keywords to search")
+    parser.add_argument("--keywords-file", help="file with one keyword per line (# starts a comment)")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: derived from the keyword list)")
+    parser.add_argument("--restart", action="store_true", help="discard the checkpoint and start over")
+    parser.add_argument("--output", help="write {keyword: project results} as JSON to this file")
+    parser.add_argument("--titles", action="store_true", help="also fetch document titles")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    keywords = read_keywords(args)
+    if not keywords:
+        parser.error("no keywords given")
+
+    path = args.checkpoint or checkpoint_path_for(keywords)
+    if args.restart:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    checkpoint = BatchCheckpoint(path, keywords)
+    logger.info(f"Batch of {len(keywords)} keywords, checkpoint {path}")
+
+    run_metrics = Metrics(parent=METRICS)
+    try:
+        with get_session_pool().lease(run_metrics) as session:
+            stats = run_batch(keywords, checkpoint, session, args.workers, args.titles)
+    except KeyboardInterrupt:
+        logger.warning(f"Interrupted; run the same command again to resume from {path}")
+        sys.exit(130)
+
+    logger.info(f"Batch done: {stats}")
+    logger.info(f"Metrics: {json.dumps(run_metrics.summary())}")
+    failed = {kind: stats[f'failed_{kind}'] for kind in ('keywords', 'projects', 'procedures', 'titles')
+              if stats[f'failed_{kind}']}
+    if failed:
+        logger.warning(f"Failed and still queued: {failed}; run again to retry them")
+    export_results(checkpoint, args.output)
+    checkpoint.close()
+
+if __name__ == '__main__':
+    main()
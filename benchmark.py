@@ -0,0 +1,233 @@
+"""Offline benchmarks for the scraper against the local fake portal.
+
+Starts `fake_portal` on a free port (or targets `--base-url`) and runs every
+scenario in its own interpreter with an empty HTTP cache and project index, so
+numbers are comparable between runs and peak RSS belongs to one scenario only:
+
+    python benchmark.py
+    python benchmark.py --projects 400 --latency 0.1 --rate 50 --json results.json
+    python benchmark.py --scenario crawl --scenario download_manager --warm
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import resource
+import tempfile
+import itertools
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+
+# Constants
+SCENARIOS = ["search", "documents", "crawl", "download_memory", "download_file", "download_manager"]
+DEFAULT_KEYWORD = "eolico"
+DOWNLOAD_SAMPLE = 40  # Documents fetched by each download scenario
+PROCEDURE_SAMPLE = 20  # Procedures listed by the documents scenario
+SCENARIO_TIMEOUT = 1800  # Seconds before a scenario subprocess is killed
+
+def portal_stats(base_url: str) -> Optional[Dict]:
+    """Return the fake portal's request counters, or None when the target is not the fake portal."""
+    try:
+        resp = requests.get(f"{base_url}/__stats", timeout=5)
+        return resp.json() if resp.status_code == 200 else None
+    except Exception:
+        return None
+
+def sample_document_urls(scraper, session, keyword: str, count: int) -> List[str]:
+    """Collect the first `count` document URLs found for `keyword`."""
+    doc_urls: List[str] = []
+    for project_url in scraper.iter_projects(keyword, session):
+        for procedura_url in scraper.get_procedura_links(project_url, session):
+            doc_urls.extend(scraper.get_document_links(procedura_url, session))
+            if len(doc_urls) >= count:
+                return doc_urls[:count]
+    return doc_urls
+
+def run_scenario(name: str, keyword: str, warm: bool) -> Dict:
+    """Run one scenario in this process and return its measurements."""
+    # Imported here so VIA_BASE_URL and the cache paths set by the parent take effect
+    import scraper
+    from crawler import iter_crawl
+    from downloads import DownloadManager
+    from project_index import get_project_index
+
+    base_url = scraper.BASE_URL
+    session = scraper.ScraperSession()
+    scratch = tempfile.mkdtemp(prefix="via-bench-")
+
+    # Inputs that are not part of what is being measured
+    procedure_urls: List[str] = []
+    doc_urls: List[str] = []
+    if name == "documents":
+        for project_url in itertools.islice(scraper.iter_projects(keyword, session), PROCEDURE_SAMPLE):
+            procedure_urls.extend(scraper.get_procedura_links(project_url, session))
+        procedure_urls = procedure_urls[:PROCEDURE_SAMPLE]
+    elif name.startswith("download"):
+        doc_urls = sample_document_urls(scraper, session, keyword, DOWNLOAD_SAMPLE)
+
+    def measure() -> Dict:
+        result: Dict = {'items': 0, 'bytes': 0, 'ttfr': None}
+        started = time.perf_counter()
+
+        if name == "search":
+            project_urls = scraper.get_projects(keyword)
+            result['items'] = len(project_urls)
+
+        elif name == "documents":
+            for procedura_url in procedure_urls:
+                for _ in scraper.iter_document_links(procedura_url, session):
+                    if result['ttfr'] is None:
+                        result['ttfr'] = time.perf_counter() - started
+                    result['items'] += 1
+
+        elif name == "crawl":
+            project_urls = scraper.iter_projects(keyword, session)
+            for record in iter_crawl(project_urls, session, index=get_project_index(), with_titles=True):
+                if record['type'] == 'document':
+                    if result['ttfr'] is None:
+                        result['ttfr'] = time.perf_counter() - started
+                    result['items'] += 1
+
+        elif name == "download_memory":
+            with ThreadPoolExecutor(max_workers=scraper.MAX_WORKERS) as executor:
+                for content in executor.map(lambda url: scraper.download_document(url, session), doc_urls):
+                    if content is not None:
+                        result['items'] += 1
+                        result['bytes'] += len(content)
+
+        elif name == "download_file":
+            folder = tempfile.mkdtemp(dir=scratch)
+            with ThreadPoolExecutor(max_workers=scraper.MAX_WORKERS) as executor:
+                for path in executor.map(lambda url: scraper.download_document_to_file(url, session, folder), doc_urls):
+                    if path is not None:
+                        result['items'] += 1
+                        result['bytes'] += os.path.getsize(path)
+
+        elif name == "download_manager":
+            manager = DownloadManager(tempfile.mkdtemp(dir=scratch), session)
+            summary = manager.run(doc_urls)
+            result['items'] = summary['complete']
+            result['bytes'] = sum(os.path.getsize(manager.path_for(url)) for url in doc_urls if manager.path_for(url))
+
+        else:
+            raise ValueError(f"Unknown scenario: {name}")
+
+        result['seconds'] = time.perf_counter() - started
+        return result
+
+    from metrics import METRICS
+
+    try:
+        if warm:
+            measure()
+        METRICS.reset()
+        before = portal_stats(base_url)
+        result = measure()
+        after = portal_stats(base_url)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    result['scenario'] = name
+    result['warm'] = warm
+    result['metrics'] = METRICS.summary()
+    if before and after:
+        result['requests'] = after['requests'] - before['requests']
+        result['not_modified'] = after['not_modified'] - before['not_modified']
+        result['errors'] = after['errors'] - before['errors']
+        result['requests_per_second'] = result['requests'] / result['seconds'] if result['seconds'] else None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result['peak_rss_mb'] = maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return result
+
+def run_in_subprocess(name: str, args: argparse.Namespace, base_url: str) -> Dict:
+    """Run a scenario in a fresh interpreter with its own empty cache and index."""
+    with tempfile.TemporaryDirectory(prefix="via-bench-state-") as state:
+        env = dict(os.environ,
+                   VIA_BASE_URL=base_url,
+                   VIA_CACHE_PATH=os.path.join(state, "http_cache.sqlite"),
+                   VIA_INDEX_PATH=os.path.join(state, "index.sqlite"))
+        command = [sys.executable, os.path.abspath(__file__), "--run-scenario", name, "--keyword", args.keyword]
+        if args.rate:
+            command += ["--rate", str(args.rate)]
+        if args.warm:
+            command.append("--warm")
+        proc = subprocess.run(command, env=env, capture_output=True, text=True, timeout=SCENARIO_TIMEOUT)
+    if proc.returncode != 0:
+        return {'scenario': name, 'error': proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def start_fake_portal(args: argparse.Namespace) -> str:
+    """Serve the fake portal on a background thread and return its base URL."""
+    from werkzeug.serving import make_server
+    from fake_portal import PortalConfig, create_app
+
+    config = PortalConfig(args.projects, args.procedures, args.documents, args.docs_page_size,
+                          args.doc_size, args.latency, args.error_rate)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, create_app(config), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+def format_table(results: List[Dict]) -> str:
+    columns = [
+        ("scenario", "{}"), ("seconds", "{:.2f}"), ("ttfr", "{:.3f}"), ("items", "{}"),
+        ("requests", "{}"), ("requests_per_second", "{:.1f}"), ("bytes", "{}"), ("peak_rss_mb", "{:.1f}"),
+    ]
+    rows = [[name for name, _ in columns]]
+    for result in results:
+        if 'error' in result:
+            rows.append([result['scenario'], f"failed: {result['error']}"] + [""] * (len(columns) - 2))
+            continue
+        rows.append([fmt.format(result[name]) if result.get(name) is not None else "-" for name, fmt in columns])
+    widths = [max(len(row[i]) for row in rows if i < len(row)) for i in range(len(columns))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(row, widths)) for row in rows)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the scraper against a local fake VIA portal.")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="scenario to run (repeatable, default all)")
+    parser.add_argument("--keyword", default=DEFAULT_KEYWORD)
+    parser.add_argument("--base-url", help="benchmark an already running portal instead of starting one")
+    parser.add_argument("--rate", type=float, help="requests per second allowed per host (default: scraper's limit)")
+    parser.add_argument("--warm", action="store_true", help="measure a second run, against a warm cache")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--projects", type=int, default=120)
+    parser.add_argument("--procedures", type=int, default=2)
+    parser.add_argument("--documents", type=int, default=30)
+    parser.add_argument("--docs-page-size", type=int, default=20)
+    parser.add_argument("--doc-size", type=int, default=256 * 1024)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--run-scenario", choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scenario:
+        import scraper
+        if args.rate:
+            scraper.RATE_LIMITER.rate = args.rate
+            scraper.RATE_LIMITER.burst = max(1, int(args.rate))
+        print(json.dumps(run_scenario(args.run_scenario, args.keyword, args.warm)))
+        return
+
+    base_url = args.base_url.rstrip("/") if args.base_url else start_fake_portal(args)
+    print(f"Benchmarking against {base_url}")
+
+    results = []
+    for name in args.scenario or SCENARIOS:
+        print(f"Running {name}...", flush=True)
+        results.append(run_in_subprocess(name, args, base_url))
+
+    print(format_table(results))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
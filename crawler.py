@@ -0,0 +1,246 @@
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from metadata import fetch_document_title
+from project_index import ProjectIndex, document_id_from_url, folder_id_from_url
+from scraper import (
+    MAX_WORKERS,
+    ScraperSession,
+    get_document_links,
+    get_procedura_links,
+    get_project_info,
+)
+
+logger = logging.getLogger(__name__)
+
+# Crawl task stages
+PROJECT = "project"
+PROCEDURE = "procedure"
+TITLE = "title"
+
+# Events from the project URL producer thread
+URL = "url"
+URLS_DONE = "urls_done"
+
+def crawl_project_page(project_url: str, session: ScraperSession,
+                       delta_state: Optional[ProjectIndex] = None) -> Tuple[List[str], Optional[Dict]]:
+    """Return a project's procedure links and info, raising ListingError if the page cannot be read."""
+    return get_procedura_links(project_url, session, delta_state, strict=True), get_project_info(project_url, session)
+
+def iter_crawl(
+    project_urls: Iterable[str],
+    session: ScraperSession,
+    max_workers: int = MAX_WORKERS,
+    index: Optional[ProjectIndex] = None,
+    delta: bool = False,
+    with_titles: bool = False,
+    revalidate: bool = False,
+) -> Iterator[Dict]:
+    """Crawl projects through a bounded worker pool, yielding records as soon as they are found.
+
+    `project_urls` may be a lazy iterator. Records are tagged by 'type': 'project',
+    'procedure', 'document' and 'project_done' (with a `crawl_projects` result).
+    Finished projects are recorded in `index`; `delta` adds `new_documents` and
+    `removed_documents` to each result (see `scraper.iter_paginated_links` for
+    `revalidate`), and `with_titles` sets each document's `title`.
+    """
+    if delta and index is None:
+        raise ValueError("A delta crawl needs an index holding the previous run")
+    delta_state = index if delta else None
+
+    date_found = time.strftime('%Y-%m-%d %H:%M:%S')
+    events: "queue.Queue[tuple]" = queue.Queue()
+    stop = threading.Event()
+    results: List[Dict] = []
+    procedure_docs: Dict[tuple, List[Dict]] = {}
+    pending: Dict[int, int] = {}
+    outstanding = 0
+    urls_done = False
+
+    def produce_urls() -> None:
+        try:
+            for url in project_urls:
+                if stop.is_set():
+                    break
+                events.put((URL, url))
+        except Exception as e:
+            logger.error(f"Failed to list projects: {e}")
+        finally:
+            events.put((URLS_DONE, None))
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def timed(stage: str, fn: Callable, *args, **kwargs):
+        with session.metrics.timer('via_crawl_task_seconds', stage=stage):
+            return fn(*args, **kwargs)
+
+    def submit(key: tuple, fn: Callable, *args, **kwargs) -> None:
+        nonlocal outstanding
+        outstanding += 1
+        future = executor.submit(timed, key[1], fn, *args, **kwargs)
+        future.add_done_callback(lambda future: events.put((key, future)))
+
+    def finish_project(i: int) -> Dict:
+        result = results[i]
+        for j in range(len(result['procedure_urls'])):
+            result['documents'].extend(procedure_docs.pop((i, j)))
+        if delta:
+            record_delta(result, index)
+        if index is not None:
+            index.add_crawl_result(result)
+        return {'type': 'project_done', 'result': result}
+
+    threading.Thread(target=produce_urls, name="crawl-project-urls", daemon=True).start()
+    try:
+        while not urls_done or outstanding:
+            key, payload = events.get()
+            if key == URL:
+                i = len(results)
+                results.append({'project_url': payload, 'project_info': None, 'procedure_urls': [], 'documents': [],
+                                'failed_urls': []})
+                pending[i] = 1
+                submit((i, PROJECT, None), crawl_project_page, payload, session, delta_state)
+                continue
+            if key == URLS_DONE:
+                urls_done = True
+                continue
+
+            outstanding -= 1
+            i, stage, j = key
+            result = results[i]
+            try:
+                outcome = payload.result()
+            except Exception as e:
+                logger.error(f"Crawl task failed for {result['project_url']}: {e}")
+                outcome = {PROJECT: ([], None), PROCEDURE: [], TITLE: None}[stage]
+                if stage == PROJECT:
+                    result['failed_urls'].append(result['project_url'])
+                elif stage == PROCEDURE:
+                    result['failed_urls'].append(result['procedure_urls'][j])
+
+            if stage == PROJECT:
+                # Project page done: fan out one task per unique procedure
+                links, result['project_info'] = outcome
+                result['procedure_urls'] = list(dict.fromkeys(links))
+                pending[i] += len(result['procedure_urls'])
+                for j, proc_url in enumerate(result['procedure_urls']):
+                    submit((i, PROCEDURE, j), get_document_links, proc_url, session, delta_state=delta_state,
+                           strict=True, revalidate=revalidate)
+                yield {'type': 'project', 'project_url': result['project_url'],
+                       'project_info': result['project_info'], 'procedure_urls': result['procedure_urls']}
+            elif stage == PROCEDURE:
+                proc_url = result['procedure_urls'][j]
+                docs = procedure_docs[(i, j)] = [
+                    {'url': doc_url, 'project_url': result['project_url'], 'procedure_url': proc_url,
+                     'date_found': date_found}
+                    for doc_url in outcome
+                ]
+                yield {'type': 'procedure', 'project_url': result['project_url'], 'procedure_url': proc_url,
+                       'document_count': len(docs)}
+
+                known = {}
+                if with_titles and index is not None:
+                    known = index.document_titles([document_id_from_url(doc['url']) for doc in docs])
+                for k, doc in enumerate(docs):
+                    if with_titles:
+                        doc['title'] = known.get(document_id_from_url(doc['url']))
+                        if doc['title'] is None:
+                            pending[i] += 1
+                            submit((i, TITLE, (j, k)), fetch_document_title, document_id_from_url(doc['url']), session)
+                            continue
+                    yield {'type': 'document', **doc}
+            else:
+                doc = procedure_docs[(i, j[0])][j[1]]
+                doc['title'] = outcome
+                yield {'type': 'document', **doc}
+
+            pending[i] -= 1
+            if pending[i] == 0:
+                yield finish_project(i)
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    logger.info(f"Crawled {len(results)} projects with {max_workers} workers")
+    if delta:
+        report = delta_report(results)
+        logger.info(f"Delta crawl: {len(report['new'])} new, {len(report['removed'])} removed documents")
+
+def crawl_projects(
+    project_urls: List[str],
+    session: ScraperSession,
+    max_workers: int = MAX_WORKERS,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    index: Optional[ProjectIndex] = None,
+    delta: bool = False,
+    with_titles: bool = False,
+    revalidate: bool = False,
+) -> List[Dict]:
+    """Crawl projects, their procedures and documents through a bounded worker pool.
+
+    Results are returned in the order of `project_urls`, one dict per project with
+    `project_url`, `project_info`, `procedure_urls`, `documents` and `failed_urls`.
+    `progress_callback` is invoked from the calling thread with
+    (projects_done, projects_total). See `iter_crawl` for the other options.
+    """
+    results = {}
+    done = 0
+    for record in iter_crawl(project_urls, session, max_workers, index, delta, with_titles, revalidate):
+        if record['type'] == 'project_done':
+            results[record['result']['project_url']] = record['result']
+            done += 1
+            if progress_callback:
+                progress_callback(done, len(project_urls))
+    return [results[url] for url in project_urls]
+
+def record_delta(result: Dict, index: ProjectIndex) -> None:
+    """Compare a project's crawled documents with the index and drop the removed ones, skipping failed listings."""
+    failed = set(result.get('failed_urls', []))
+    known = set()
+    if result['project_url'] not in failed:
+        known = {doc['url'] for doc in index.documents_for_project(folder_id_from_url(result['project_url']))
+                 if doc['procedure_url'] not in failed}
+    current = {doc['url'] for doc in result['documents']}
+    result['new_documents'] = [doc for doc in result['documents'] if doc['url'] not in known]
+    result['removed_documents'] = sorted(known - current)
+    index.remove_documents(result['removed_documents'])
+
+def delta_report(results: List[Dict]) -> Dict[str, List]:
+    """Collect the new and removed documents of a delta crawl."""
+    return {
+        'new': [doc for result in results for doc in result.get('new_documents', [])],
+        'removed': [url for result in results for url in result.get('removed_documents', [])],
+    }
+
+def find_project_by_code(
+    project_code: str,
+    project_urls: List[str],
+    session: ScraperSession,
+    index: Optional[ProjectIndex] = None,
+    max_workers: int = MAX_WORKERS,
+) -> Optional[Dict]:
+    """Find a project by code, answering from `index` and scanning `project_urls` only on a miss."""
+    if index is not None:
+        project = index.find_by_code(project_code)
+        if project:
+            return project
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(get_project_info, url, session) for url in project_urls]
+        try:
+            for future in as_completed(futures):
+                info = future.result()
+                if not info:
+                    continue
+                if index is not None:
+                    index.add_project(info)
+                if info['project_code'] == project_code:
+                    return info
+        finally:
+            for future in futures:
+                future.cancel()
+    return None
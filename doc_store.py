@@ -0,0 +1,209 @@
+import os
+import time
+import shutil
+import sqlite3
+import hashlib
+import tempfile
+import threading
+import logging
+from typing import Dict, List, Optional
+
+import requests
+
+from metadata import probe_documents
+from project_index import document_id_from_url, folder_id_from_url
+from scraper import DOWNLOAD_CHUNK_SIZE, ScraperSession, get_filename_from_response
+
+logger = logging.getLogger(__name__)
+
+# Constants
+STORE_PATH = os.environ.get("VIA_STORE_PATH", os.path.join("cache", "documents"))
+STORE_CHECK_INTERVAL = 24 * 3600  # Stored documents checked this recently are trusted without a request
+
+class DocumentStore:
+    """Content-addressed store of downloaded documents, shared by every run and keyword.
+
+    Bodies live once under `objects/<sha256[:2]>/<sha256>`; `store.sqlite` maps
+    each document ID to its content hash, filename and the Content-Length and
+    Last-Modified it was downloaded with. A document attached to several
+    procedures, or re-found by another keyword, is downloaded once; views and
+    job folders are built from hardlinks to the objects.
+    """
+
+    def __init__(self, root: str = STORE_PATH, check_interval: float = STORE_CHECK_INTERVAL):
+        self.root = root
+        self.check_interval = check_interval
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(root, "tmp"), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(root, "store.sqlite"), timeout=30, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    doc_id TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_modified TEXT,
+                    filename TEXT NOT NULL,
+                    stored_at REAL NOT NULL,
+                    checked_at REAL NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS documents_sha256 ON documents (sha256)")
+
+    def object_path(self, sha256: str) -> str:
+        return os.path.join(self.root, "objects", sha256[:2], sha256)
+
+    def lookup(self, doc_url: str) -> Optional[Dict]:
+        """Return the stored record for a document (with its object `path`), or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT doc_id, url, sha256, size, last_modified, filename, stored_at, checked_at "
+                "FROM documents WHERE doc_id = ?", (document_id_from_url(doc_url),)
+            ).fetchone()
+        if row is None:
+            return None
+        record = dict(zip(("doc_id", "url", "sha256", "size", "last_modified", "filename",
+                           "stored_at", "checked_at"), row))
+        record['path'] = self.object_path(record['sha256'])
+        return record if os.path.exists(record['path']) else None
+
+    def check(self, doc_url: str, session: ScraperSession) -> Optional[Dict]:
+        """Return the stored record if it still matches the portal's copy, else None.
+
+        Recently checked records are trusted as is; otherwise the document's size
+        and Last-Modified, from a HEAD probe or a recent cached one, are compared
+        with what was stored.
+        """
+        record = self.lookup(doc_url)
+        if record is None:
+            return None
+        if time.time() - record['checked_at'] < self.check_interval:
+            return record
+
+        probe = probe_documents([doc_url], session, max_age=self.check_interval)[doc_url]
+        if probe is None:
+            logger.error(f"Failed to check stored document {doc_url}")
+            return None
+        size, last_modified = probe['size'], probe['last_modified']
+
+        if size != record['size'] or (last_modified and record['last_modified'] and last_modified != record['last_modified']):
+            logger.info(f"Stored copy of {doc_url} is outdated")
+            return None
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE documents SET checked_at = ? WHERE doc_id = ?", (time.time(), record['doc_id']))
+        return record
+
+    def writer(self, doc_url: str, response: requests.Response) -> "StoreWriter":
+        """Return a writer that adds a document to the store while its body is streamed elsewhere."""
+        return StoreWriter(self, doc_url, get_filename_from_response(response), response.headers.get('Last-Modified'))
+
+    def add_file(self, doc_url: str, path: str, filename: str, last_modified: Optional[str] = None) -> Dict:
+        """Add an already downloaded file, replacing it with a link to the stored object."""
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+                sha256.update(chunk)
+        digest = sha256.hexdigest()
+
+        object_path = self.object_path(digest)
+        if os.path.exists(object_path):
+            link_or_copy(object_path, path)  # Same content already stored: keep one copy on disk
+        else:
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            link_or_copy(path, object_path)
+        self._record(doc_url, digest, os.path.getsize(object_path), last_modified, filename)
+        return self.lookup(doc_url)
+
+    def link(self, record: Dict, dest_path: str) -> str:
+        """Materialize a stored document at `dest_path` as a hardlink (a copy across filesystems)."""
+        os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+        link_or_copy(record['path'], dest_path)
+        return dest_path
+
+    def build_view(self, documents: List[Dict], dest_folder: str) -> Dict[str, str]:
+        """Link stored documents into `<dest_folder>/<project folder ID>/<filename>`; returns URL => path."""
+        paths = {}
+        taken = set()
+        for doc in documents:
+            record = self.lookup(doc['url'])
+            if record is None:
+                continue
+            path = os.path.join(dest_folder, folder_id_from_url(doc.get('project_url', '')) or "documents", record['filename'])
+            if path in taken:
+                path = os.path.join(os.path.dirname(path), f"{record['doc_id']}_{record['filename']}")
+            taken.add(path)
+            paths[doc['url']] = self.link(record, path)
+        return paths
+
+    def _record(self, doc_url: str, sha256: str, size: int, last_modified: Optional[str], filename: str) -> None:
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO documents (doc_id, url, sha256, size, last_modified, filename, stored_at, checked_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (document_id_from_url(doc_url), doc_url, sha256, size, last_modified, filename, now, now),
+            )
+
+class StoreWriter:
+    """Hashes and spools a document body to a temporary file, committing it to the store on success."""
+
+    def __init__(self, store: DocumentStore, doc_url: str, filename: str, last_modified: Optional[str]):
+        self.store = store
+        self.doc_url = doc_url
+        self.filename = filename
+        self.last_modified = last_modified
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        fd, self.tmp_path = tempfile.mkstemp(dir=os.path.join(store.root, "tmp"), suffix=".part")
+        self.file = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        self.file.write(chunk)
+        self.sha256.update(chunk)
+        self.size += len(chunk)
+
+    def commit(self) -> None:
+        self.file.close()
+        digest = self.sha256.hexdigest()
+        object_path = self.store.object_path(digest)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        os.replace(self.tmp_path, object_path)
+        self.store._record(self.doc_url, digest, self.size, self.last_modified, self.filename)
+
+    def discard(self) -> None:
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self) -> "StoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        # Only a body read to the end is committed; failures and early exits leave nothing behind
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+
+def link_or_copy(src: str, dest: str) -> None:
+    """Atomically point `dest` at the contents of `src`, by hardlink when the filesystem allows it."""
+    tmp_path = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.link(src, tmp_path)
+    except OSError:
+        shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dest)
+
+_shared_store: Optional[DocumentStore] = None
+_shared_store_lock = threading.Lock()
+
+def get_document_store() -> DocumentStore:
+    """Return the process-wide store rooted at STORE_PATH."""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = DocumentStore()
+        return _shared_store
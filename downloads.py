@@ -0,0 +1,206 @@
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+
+from doc_store import DocumentStore
+from scraper import (
+    DOWNLOAD_CHUNK_SIZE,
+    DOWNLOAD_FOLDER,
+    MAX_WORKERS,
+    ScraperSession,
+    get_filename_from_response,
+)
+
+logger = logging.getLogger(__name__)
+
+# Constants
+MANIFEST_NAME = "manifest.jsonl"  # Append-only journal: one line per entry update, replayed on load
+DOWNLOAD_RETRIES = 4  # Attempts per document before it is marked as failed
+RETRY_BACKOFF = 1.0  # Base delay in seconds, doubled after every failed attempt
+
+# Manifest statuses
+COMPLETE = "complete"
+PARTIAL = "partial"
+FAILED = "failed"
+
+def job_folder_for(doc_urls: List[str], root: str = DOWNLOAD_FOLDER) -> str:
+    """Return a stable folder for a set of documents so re-runs resume the same job."""
+    digest = hashlib.sha1("\n".join(sorted(set(doc_urls))).encode()).hexdigest()[:16]
+    return os.path.join(root, "jobs", digest)
+
+def new_entry() -> Dict:
+    return {'status': PARTIAL, 'filename': None, 'attempts': 0}
+
+class DownloadManager:
+    """Parallel bulk downloader that resumes from an on-disk manifest.
+
+    The manifest maps each document URL to its status, filename, size and last
+    error. Updates are appended to a journal, so bookkeeping costs one short
+    write per state change; the journal is compacted when the manager is opened.
+    Completed files are skipped on re-runs and partial files are resumed
+    with an HTTP Range request. With a `store`, documents it already holds are
+    hardlinked into the folder instead of downloaded, and new downloads are added
+    to it for later runs.
+    """
+
+    def __init__(self, dest_folder: str, session: ScraperSession, max_workers: int = MAX_WORKERS,
+                 retries: int = DOWNLOAD_RETRIES, backoff: float = RETRY_BACKOFF,
+                 store: Optional[DocumentStore] = None):
+        self.dest_folder = dest_folder
+        self.session = session
+        self.store = store
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.manifest_path = os.path.join(dest_folder, MANIFEST_NAME)
+        self.lock = threading.Lock()
+        self.journal = None  # Open while `run` is downloading
+        os.makedirs(dest_folder, exist_ok=True)
+        self.manifest: Dict[str, Dict] = self._load_manifest()
+        self.taken = {entry['filename'] for entry in self.manifest.values() if entry.get('filename')}
+        self._compact_manifest()
+
+    def _load_manifest(self) -> Dict[str, Dict]:
+        manifest: Dict[str, Dict] = {}
+        if not os.path.exists(self.manifest_path):
+            return manifest
+        with open(self.manifest_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    fields = json.loads(line)
+                except ValueError:
+                    # A line torn by a crash mid-write; the entry is redone on this run
+                    logger.warning(f"Skipping damaged line in {self.manifest_path}")
+                    continue
+                manifest.setdefault(fields.pop('url'), new_entry()).update(fields)
+        return manifest
+
+    def _compact_manifest(self) -> None:
+        """Rewrite the journal with one line per entry."""
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for doc_url, entry in self.manifest.items():
+                f.write(json.dumps({'url': doc_url, **entry}) + "\n")
+        os.replace(tmp_path, self.manifest_path)
+
+    def _append(self, doc_url: str, fields: Dict) -> None:
+        """Journal an entry update; callers must hold the lock."""
+        self.journal.write(json.dumps({'url': doc_url, **fields}) + "\n")
+        self.journal.flush()
+
+    def _update(self, doc_url: str, **fields) -> Dict:
+        with self.lock:
+            entry = self.manifest.setdefault(doc_url, new_entry())
+            entry.update(fields)
+            self._append(doc_url, fields)
+            return dict(entry)
+
+    def _reserve_filename(self, doc_url: str, filename: str) -> str:
+        """Assign a filename not used by another document in this job."""
+        with self.lock:
+            if filename in self.taken and self.manifest[doc_url].get('filename') != filename:
+                doc_id = re.sub(r'[^\w.-]', '_', doc_url.rstrip('/').split('/')[-1])
+                filename = f"{doc_id}_{filename}"
+            self.taken.add(filename)
+            self.manifest[doc_url]['filename'] = filename
+            self._append(doc_url, {'filename': filename})
+        return filename
+
+    def path_for(self, doc_url: str) -> Optional[str]:
+        """Return the local path of a completed document, or None."""
+        entry = self.manifest.get(doc_url)
+        if not entry or entry['status'] != COMPLETE:
+            return None
+        path = os.path.join(self.dest_folder, entry['filename'])
+        return path if os.path.exists(path) else None
+
+    def run(self, doc_urls: List[str],
+            progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+        """Download every document not already complete and return counts per status."""
+        doc_urls = list(dict.fromkeys(doc_urls))
+        todo = [url for url in doc_urls if not self.path_for(url)]
+        logger.info(f"{len(doc_urls) - len(todo)} of {len(doc_urls)} documents already downloaded")
+
+        done = len(doc_urls) - len(todo)
+        if progress_callback:
+            progress_callback(done, len(doc_urls))
+
+        with open(self.manifest_path, "a", encoding="utf-8") as self.journal, \
+                ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for future in as_completed(executor.submit(self._download, url) for url in todo):
+                future.result()
+                done += 1
+                if progress_callback:
+                    progress_callback(done, len(doc_urls))
+        self.journal = None
+
+        summary = {COMPLETE: 0, PARTIAL: 0, FAILED: 0}
+        for url in doc_urls:
+            summary[COMPLETE if self.path_for(url) else self.manifest[url]['status']] += 1
+        return summary
+
+    def _download(self, doc_url: str) -> None:
+        entry = self._update(doc_url, status=PARTIAL)
+        if self.store is not None and self._link_from_store(doc_url, entry.get('filename')):
+            return
+        for attempt in range(self.retries):
+            try:
+                self._fetch(doc_url, entry.get('filename'))
+                return
+            except Exception as e:
+                entry = self._update(doc_url, attempts=entry['attempts'] + 1, error=str(e))
+                logger.warning(f"Download attempt {attempt + 1} failed for {doc_url}: {e}")
+                if attempt + 1 < self.retries:
+                    self.session.metrics.inc('via_retries_total', stage="download")
+                    time.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+        self._update(doc_url, status=FAILED)
+        logger.error(f"Giving up on {doc_url} after {self.retries} attempts")
+
+    def _link_from_store(self, doc_url: str, filename: Optional[str]) -> bool:
+        """Complete a document from the store when it holds an up-to-date copy."""
+        record = self.store.check(doc_url, self.session)
+        if record is None:
+            return False
+        filename = filename or self._reserve_filename(doc_url, record['filename'])
+        self.store.link(record, os.path.join(self.dest_folder, filename))
+        self._update(doc_url, status=COMPLETE, size=record['size'], error=None)
+        return True
+
+    def _fetch(self, doc_url: str, filename: Optional[str]) -> None:
+        """Download (or resume) one document into its .part file and finalize it."""
+        part_path = os.path.join(self.dest_folder, filename + ".part") if filename else None
+        offset = os.path.getsize(part_path) if part_path and os.path.exists(part_path) else 0
+        headers = {'Range': f"bytes={offset}-"} if offset else {}
+        last_modified = None
+
+        with self.session.get(doc_url, stream=True, timeout=30, headers=headers) as response:
+            # 416 on a resume means the partial file already holds the whole body
+            if not (response.status_code == 416 and offset):
+                response.raise_for_status()
+                if response.status_code != 206 or not response.headers.get('Content-Range', '').startswith(f"bytes {offset}-"):
+                    offset = 0  # Server ignored the Range header; start over
+                last_modified = response.headers.get('Last-Modified')
+
+                if not filename:
+                    filename = self._reserve_filename(doc_url, get_filename_from_response(response))
+                    part_path = os.path.join(self.dest_folder, filename + ".part")
+
+                with open(part_path, "ab" if offset else "wb") as f:
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+
+        path = os.path.join(self.dest_folder, filename)
+        os.replace(part_path, path)
+        self._update(doc_url, status=COMPLETE, size=os.path.getsize(path), error=None)
+        if self.store is not None:
+            try:
+                self.store.add_file(doc_url, path, filename, last_modified)
+            except Exception as e:
+                logger.error(f"Failed to add {doc_url} to the document store: {e}")
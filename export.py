@@ -0,0 +1,174 @@
+import io
+import os
+import queue
+import logging
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+from doc_store import DocumentStore
+from project_index import folder_id_from_url
+from scraper import DOWNLOAD_CHUNK_SIZE, ScraperSession, get_filename_from_response, zip_entry_info
+
+logger = logging.getLogger(__name__)
+
+# Constants
+EXPORT_WORKERS = 4  # Documents fetched ahead of the one being written to the archive
+EXPORT_BUFFER_CHUNKS = 8  # Chunks buffered per fetched-ahead document; bounds memory with EXPORT_WORKERS
+MISSING_ENTRY = "MISSING.txt"  # Lists documents that could not be (fully) included
+
+# Messages from a document fetcher
+FILENAME = "filename"
+CHUNK = "chunk"
+END = "end"
+ERROR = "error"
+
+class _StreamSink(io.RawIOBase):
+    """Write-only, unseekable file that holds ZipFile output until the generator yields it."""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def _fetch_document(doc_url: str, session: ScraperSession, out: queue.Queue, stop: threading.Event,
+                    chunk_size: int, store: Optional[DocumentStore] = None) -> None:
+    """Stream a document into `out` as (kind, payload) messages, blocking while the queue is full.
+
+    With a `store`, an up-to-date stored copy is read from disk; otherwise the
+    body is added to the store while it is streamed.
+    """
+    def put(message: tuple) -> bool:
+        while not stop.is_set():
+            try:
+                out.put(message, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    writer = None
+    try:
+        record = store.check(doc_url, session) if store is not None else None
+        if record is not None:
+            if not put((FILENAME, record['filename'])):
+                return
+            with open(record['path'], "rb") as f:
+                for chunk in iter(lambda: f.read(chunk_size), b""):
+                    if not put((CHUNK, chunk)):
+                        return
+            put((END, None))
+            return
+
+        with session.get(doc_url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            if store is not None:
+                writer = store.writer(doc_url, response)
+            if not put((FILENAME, get_filename_from_response(response))):
+                return
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if writer is not None:
+                    writer.write(chunk)
+                if not put((CHUNK, chunk)):
+                    return
+        if writer is not None:
+            writer.commit()
+            writer = None
+        put((END, None))
+    except Exception as e:
+        put((ERROR, e))
+    finally:
+        if writer is not None:
+            writer.discard()
+
+def _unique_name(arcname: str, names: set) -> str:
+    root, ext = os.path.splitext(arcname)
+    n = 1
+    while arcname in names:
+        n += 1
+        arcname = f"{root}_{n}{ext}"
+    names.add(arcname)
+    return arcname
+
+def iter_zip_stream(
+    documents: List[Dict],
+    session: ScraperSession,
+    max_workers: int = EXPORT_WORKERS,
+    chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+    buffer_chunks: int = EXPORT_BUFFER_CHUNKS,
+    store: Optional[DocumentStore] = None,
+) -> Iterator[bytes]:
+    """Yield a ZIP archive of `documents` as it is built, without a temporary file.
+
+    Entries follow the order of `documents` and are named
+    `<project folder ID>_<filename>` like the Streamlit export. The next
+    `max_workers` documents are fetched concurrently into bounded buffers, so
+    memory stays under roughly max_workers * buffer_chunks * chunk_size.
+    Already-compressed formats are stored rather than deflated. Documents that
+    fail are listed in MISSING.txt at the end of the archive. With a `store`,
+    documents it holds are read from disk and the others are added to it.
+    """
+    sink = _StreamSink()
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    buffers: Dict[int, queue.Queue] = {}
+    names: set = set()
+    missing: List[str] = []
+
+    def start(i: int) -> None:
+        if i < len(documents):
+            buffers[i] = queue.Queue(maxsize=buffer_chunks)
+            executor.submit(_fetch_document, documents[i]['url'], session, buffers[i], stop, chunk_size, store)
+
+    try:
+        for i in range(max_workers):
+            start(i)
+
+        with zipfile.ZipFile(sink, "w") as zipf:
+            for i, doc in enumerate(documents):
+                buffer = buffers.pop(i)
+                kind, payload = buffer.get()
+                if kind == ERROR:
+                    logger.error(f"Failed to add document {doc['url']} to archive: {payload}")
+                    missing.append(f"{doc['url']}\t{payload}")
+                else:
+                    prefix = f"{folder_id_from_url(doc['project_url'])}_" if doc.get('project_url') else ""
+                    arcname = _unique_name(f"{prefix}{payload}", names)
+                    with zipf.open(zip_entry_info(arcname), "w", force_zip64=True) as entry:
+                        while True:
+                            kind, payload = buffer.get()
+                            if kind != CHUNK:
+                                break
+                            entry.write(payload)
+                            data = sink.drain()
+                            if data:
+                                yield data
+                    if kind == ERROR:
+                        # Bytes already sent cannot be taken back; the entry stays, truncated
+                        logger.error(f"Document {doc['url']} was cut short in the archive: {payload}")
+                        missing.append(f"{doc['url']}\tincomplete ({arcname}): {payload}")
+
+                start(i + max_workers)
+                data = sink.drain()
+                if data:
+                    yield data
+
+            if missing:
+                zipf.writestr(zip_entry_info(MISSING_ENTRY), "\n".join(missing) + "\n")
+        yield sink.drain()
+    finally:
+        # Also reached when the client disconnects: unblock and drop the fetchers
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,177 @@
+"""Single-pass extraction of the few patterns the scraper reads from portal pages.
+
+Building a full BeautifulSoup tree for every page made parsing the bottleneck of
+concurrent crawls. The portal's listing pages only need anchor hrefs, the
+pagination links and a couple of table cells, which these regular expressions
+pull out in C. Run `python extract.py` to check them against the BeautifulSoup
+implementation on the pages in `fixtures/`.
+"""
+import os
+import re
+import sys
+import glob
+import html as html_lib
+from typing import Dict, List, Optional
+
+# Markup BeautifulSoup never yields anchors from
+IGNORED_MARKUP = re.compile(r'<!--.*?-->|<script\b.*?</script\s*>|<style\b.*?</style\s*>', re.I | re.S)
+ANCHOR_HREF = re.compile(
+    r'<a\s[^>]*?(?<=[\s"\'])href\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+))', re.I
+)
+PAGINATION_LIST = re.compile(
+    r'<ul\s[^>]*?class\s*=\s*["\'](?:[^"\']*\s)?pagination(?:\s[^"\']*)?["\'][^>]*>(.*?)</ul\s*>', re.I | re.S
+)
+TABLE = re.compile(
+    r'<table\s[^>]*?class\s*=\s*["\'](?:[^"\']*\s)?table(?:\s[^"\']*)?["\'][^>]*>(.*?)</table\s*>', re.I | re.S
+)
+ROW = re.compile(r'<tr\b[^>]*>(.*?)(?=<tr\b|</tr\s*>|$)', re.I | re.S)
+CELL = re.compile(r'<td\b[^>]*>(.*?)(?=<td\b|</td\s*>|</tr\s*>|$)', re.I | re.S)
+TAG = re.compile(r'<[^>]*>')
+HEADING = re.compile(r'<h1\b[^>]*>(.*?)</h1\s*>', re.I | re.S)
+DOCUMENT_TITLE = re.compile(r'<td\b[^>]*>Documento</td\s*>.*?<td\b[^>]*>(.*?)</td\s*>', re.I | re.S)
+
+def strip_ignored(html: str) -> str:
+    """Drop comments, scripts and styles whose contents are not markup."""
+    lowered = html.lower()
+    if '<!--' in html or '<script' in lowered or '<style' in lowered:
+        return IGNORED_MARKUP.sub('', html)
+    return html
+
+def hrefs(html: str) -> List[str]:
+    """Return the href of every anchor, in document order, with entities decoded."""
+    return [
+        html_lib.unescape(next(group for group in match.groups() if group is not None))
+        for match in ANCHOR_HREF.finditer(html)
+    ]
+
+def text_content(fragment: str) -> str:
+    """Return the text of an HTML fragment, like BeautifulSoup's `.text`."""
+    return html_lib.unescape(TAG.sub('', fragment))
+
+class Page:
+    """An HTML page with its anchor and pagination hrefs extracted once, on demand."""
+
+    def __init__(self, html: str):
+        self.html = strip_ignored(html)
+        self._hrefs: Optional[List[str]] = None
+        self._pagination_hrefs: Optional[List[str]] = None
+
+    @property
+    def hrefs(self) -> List[str]:
+        if self._hrefs is None:
+            self._hrefs = hrefs(self.html)
+        return self._hrefs
+
+    @property
+    def pagination_hrefs(self) -> Optional[List[str]]:
+        """Hrefs inside the first `ul.pagination`, or None if the page has none."""
+        if self._pagination_hrefs is None:
+            match = PAGINATION_LIST.search(self.html)
+            if match is None:
+                return None
+            self._pagination_hrefs = hrefs(match.group(1))
+        return self._pagination_hrefs
+
+    def links_containing(self, marker: str) -> List[str]:
+        """Return the hrefs containing `marker`, in document order."""
+        return [href for href in self.hrefs if marker in href]
+
+def procedure_code(html: str) -> Optional[str]:
+    """Return the `Codice procedura` value from the first `table.table`, if present."""
+    table = TABLE.search(strip_ignored(html))
+    if table is None:
+        return None
+
+    code = None
+    for row in ROW.finditer(table.group(1)):
+        cells = CELL.findall(row.group(1))
+        if len(cells) >= 2 and 'Codice procedura' in text_content(cells[0]):
+            code = text_content(cells[1]).strip()
+    return code
+
+def info_fields(html: str) -> Dict[str, str]:
+    """Return the label/value rows of the first `table.table` (e.g. Proponente, Tipologia)."""
+    table = TABLE.search(strip_ignored(html))
+    if table is None:
+        return {}
+
+    fields = {}
+    for row in ROW.finditer(table.group(1)):
+        cells = CELL.findall(row.group(1))
+        if len(cells) >= 2:
+            fields[text_content(cells[0]).strip()] = text_content(cells[1]).strip()
+    return fields
+
+def project_title(html: str) -> Optional[str]:
+    """Return the text of the page's first `h1`, the project title on an Info page."""
+    match = HEADING.search(strip_ignored(html))
+    return text_content(match.group(1)).strip() if match else None
+
+def document_title(html: str) -> Optional[str]:
+    """Return the cell following the `Documento` label on a MetadatoDocumento page."""
+    match = DOCUMENT_TITLE.search(strip_ignored(html))
+    return text_content(match.group(1)).strip() if match else None
+
+def _reference_extraction(html: str) -> dict:
+    """Extract the same values with BeautifulSoup, as the scraper originally did."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    pagination = soup.find('ul', class_='pagination')
+
+    code = None
+    fields = {}
+    table = soup.find('table', class_='table')
+    if table:
+        for row in table.find_all('tr'):
+            cells = row.find_all('td')
+            if len(cells) >= 2 and 'Codice procedura' in cells[0].text:
+                code = cells[1].text.strip()
+            if len(cells) >= 2:
+                fields[cells[0].text.strip()] = cells[1].text.strip()
+
+    heading = soup.find('h1')
+
+    title = None
+    label = soup.find('td', string='Documento')
+    if label and label.find_next('td'):
+        title = label.find_next('td').text.strip()
+
+    return {
+        'hrefs': [a['href'] for a in soup.find_all('a', href=True)],
+        'pagination_hrefs': [a['href'] for a in pagination.find_all('a', href=True)] if pagination else None,
+        'procedure_code': code,
+        'info_fields': fields,
+        'project_title': heading.text.strip() if heading else None,
+        'document_title': title,
+    }
+
+def _fast_extraction(html: str) -> dict:
+    page = Page(html)
+    return {
+        'hrefs': page.hrefs,
+        'pagination_hrefs': page.pagination_hrefs,
+        'procedure_code': procedure_code(html),
+        'info_fields': info_fields(html),
+        'project_title': project_title(html),
+        'document_title': document_title(html),
+    }
+
+def check_fixtures(paths: List[str]) -> bool:
+    """Compare fast and reference extraction on fixture pages and report mismatches."""
+    ok = True
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        expected, actual = _reference_extraction(html), _fast_extraction(html)
+        for key in expected:
+            if expected[key] != actual[key]:
+                ok = False
+                print(f"{path}: {key} differs\n  expected {expected[key]!r}\n  got      {actual[key]!r}")
+        if expected == actual:
+            print(f"{path}: ok")
+    return ok
+
+if __name__ == '__main__':
+    fixtures = sys.argv[1:] or sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "*.html")))
+    sys.exit(0 if check_fixtures(fixtures) else 1)
@@ -0,0 +1,268 @@
+"""Local stand-in for the VIA portal, for benchmarks and offline development.
+
+Serves generated search, Oggetti/Info, Oggetti/Documentazione, MetadatoDocumento
+and File/Documento pages with the markup the scraper reads. Dataset size,
+latency, error rate and document sizes are configurable:
+
+    python fake_portal.py --projects 300 --latency 0.08 --error-rate 0.02
+    VIA_BASE_URL=http://127.0.0.1:5001 streamlit run streamlit_app.py
+"""
+import re
+import time
+import random
+import hashlib
+import argparse
+import threading
+from email.utils import formatdate
+from html import escape
+from typing import Dict, List
+
+from flask import Flask, Response, abort, request
+
+# Constants
+PROJECT_ID_START = 10000
+PROCEDURE_ID_START = 20000
+DOCUMENT_ID_START = 500000
+PAGINATION_WINDOW = 5  # Page links shown around the current page, besides first/last
+TOPICS = [
+    "eolico", "fotovoltaico", "agrivoltaico", "elettrodotto", "metanodotto", "porto",
+    "autostrada", "ferrovia", "discarica", "impianto idroelettrico", "cava", "raffineria",
+]
+PLACES = ["Puglia", "Sicilia", "Sardegna", "Basilicata", "Calabria", "Toscana", "Lazio", "Veneto"]
+DOCUMENT_KINDS = [
+    "Relazione tecnica", "Studio di impatto ambientale", "Sintesi non tecnica", "Tavola",
+    "Relazione paesaggistica", "Piano di monitoraggio", "Osservazioni", "Parere",
+]
+LAST_MODIFIED = formatdate(1700000000, usegmt=True)
+
+class PortalConfig:
+    """Shape and behaviour of the generated portal."""
+
+    def __init__(self, projects: int = 120, procedures: int = 2, documents: int = 30,
+                 docs_page_size: int = 20, doc_size: int = 256 * 1024, latency: float = 0.05,
+                 error_rate: float = 0.0, seed: int = 42):
+        self.projects = projects
+        self.procedures = procedures
+        self.documents = documents
+        self.docs_page_size = docs_page_size
+        self.doc_size = doc_size
+        self.latency = latency
+        self.error_rate = error_rate
+        self.seed = seed
+
+class Dataset:
+    """Deterministic projects, procedures and documents generated from a seed."""
+
+    def __init__(self, config: PortalConfig):
+        rng = random.Random(config.seed)
+        self.projects: Dict[str, Dict] = {}
+        self.procedures: Dict[str, List[str]] = {}
+        self.documents: Dict[str, Dict] = {}
+
+        for p in range(config.projects):
+            folder_id = str(PROJECT_ID_START + p)
+            title = f"Progetto {rng.choice(TOPICS)} {rng.choice(PLACES)} n. {p + 1}"
+            procedure_ids = []
+            for q in range(config.procedures):
+                procedure_id = str(PROCEDURE_ID_START + p * config.procedures + q)
+                procedure_ids.append(procedure_id)
+                doc_ids = []
+                for d in range(config.documents):
+                    doc_id = str(DOCUMENT_ID_START + (p * config.procedures + q) * config.documents + d)
+                    doc_ids.append(doc_id)
+                    self.documents[doc_id] = {
+                        'title': f"{rng.choice(DOCUMENT_KINDS)} {d + 1} - {title}",
+                        'filename': f"{doc_id}_elaborato_{d + 1}.pdf",
+                        'size': max(1, int(config.doc_size * rng.uniform(0.5, 1.5))),
+                    }
+                self.procedures[procedure_id] = doc_ids
+            self.projects[folder_id] = {
+                'title': title,
+                'code': str(12000 + p),
+                'procedures': procedure_ids,
+            }
+
+    def search(self, keyword: str) -> List[str]:
+        keyword = keyword.lower().strip()
+        return [folder_id for folder_id, project in self.projects.items()
+                if not keyword or keyword in project['title'].lower()]
+
+def pagination(page: int, last_page: int, href) -> str:
+    """Render a Bootstrap `ul.pagination` with a sliding window and a last-page link."""
+    if last_page <= 1:
+        return ""
+    numbers = sorted({1, last_page} | set(range(max(1, page - PAGINATION_WINDOW), min(last_page, page + PAGINATION_WINDOW) + 1)))
+    items = "".join(
+        f'<li class="{"active" if n == page else ""}"><a href="{escape(href(n))}">{n}</a></li>' for n in numbers
+    )
+    return f'<ul class="pagination">{items}</ul>'
+
+def layout(title: str, body: str) -> str:
+    return (
+        f'<!DOCTYPE html><html lang="it"><head><meta charset="utf-8" /><title>{escape(title)}</title></head>'
+        f'<body><nav><a href="/it-IT">Home</a> <a href="/it-IT/Ricerca/ViaLibera">Ricerca</a></nav>'
+        f'<div class="container">{body}</div></body></html>'
+    )
+
+def create_app(config: PortalConfig) -> Flask:
+    """Build the fake portal application."""
+    app = Flask(__name__)
+    dataset = Dataset(config)
+    stats = {'requests': 0, 'bytes': 0, 'errors': 0, 'not_modified': 0}
+    stats_lock = threading.Lock()
+
+    def count(**increments) -> None:
+        with stats_lock:
+            for key, value in increments.items():
+                stats[key] += value
+
+    @app.before_request
+    def simulate_network():
+        if request.path.startswith("/__"):
+            return None
+        count(requests=1)
+        if config.latency:
+            time.sleep(random.uniform(0.5, 1.5) * config.latency)
+        if config.error_rate and random.random() < config.error_rate:
+            count(errors=1)
+            return Response("Service Unavailable", status=503)
+        return None
+
+    def html_response(html: str) -> Response:
+        # Strong validators so the scraper's cache can revalidate with a 304
+        etag = '"' + hashlib.md5(html.encode()).hexdigest() + '"'
+        if request.headers.get('If-None-Match') == etag:
+            count(not_modified=1)
+            return Response(status=304, headers={'ETag': etag})
+        count(bytes=len(html))
+        return Response(html, mimetype="text/html", headers={'ETag': etag, 'Last-Modified': LAST_MODIFIED})
+
+    @app.route("/")
+    @app.route("/it-IT")
+    def home():
+        response = html_response(layout("Valutazioni e Autorizzazioni Ambientali", "<h1>VIA</h1>"))
+        response.set_cookie("ASP.NET_SessionId", hashlib.sha1(str(random.random()).encode()).hexdigest()[:24])
+        return response
+
+    @app.route("/it-IT/Ricerca/ViaLibera")
+    def search():
+        keyword = request.args.get("Testo", "")
+        page = max(1, request.args.get("p", 1, type=int))
+        page_size = max(1, request.args.get("ps", 25, type=int))
+        matches = dataset.search(keyword)
+        last_page = max(1, -(-len(matches) // page_size))
+        rows = "".join(
+            f'<tr><td><a href="/it-IT/Oggetti/Info/{folder_id}">{escape(dataset.projects[folder_id]["title"])}</a></td>'
+            f'<td>Proponente {folder_id}</td></tr>'
+            for folder_id in matches[(page - 1) * page_size:page * page_size]
+        )
+        href = lambda n: f"/it-IT/Ricerca/ViaLibera?Testo={keyword}&t=o&p={n}&ps={page_size}"
+        body = f'<table class="ElencoViaVasRicerca table">{rows}</table>' if rows else '<p>Nessun risultato</p>'
+        return html_response(layout("Ricerca", body + (pagination(page, last_page, href) if rows else "")))
+
+    @app.route("/it-IT/Oggetti/Info/<folder_id>")
+    def project_info(folder_id):
+        project = dataset.projects.get(folder_id) or abort(404)
+        procedures = "".join(
+            f'<tr><td><a href="/it-IT/Oggetti/Documentazione/{folder_id}/{procedure_id}">Procedura {procedure_id}</a></td></tr>'
+            for procedure_id in project['procedures']
+        )
+        body = (
+            f'<h1>{escape(project["title"])}</h1>'
+            f'<table class="table table-striped"><tr><td>Proponente</td><td>Proponente {folder_id}</td></tr>'
+            f'<tr><td>Codice procedura (ID_VIP/ID_MATTM)</td><td>{project["code"]}</td></tr></table>'
+            f'<table class="ElencoProcedure">{procedures}</table>'
+        )
+        return html_response(layout(project['title'], body))
+
+    @app.route("/it-IT/Oggetti/Documentazione/<folder_id>/<procedure_id>")
+    def procedure_documents(folder_id, procedure_id):
+        doc_ids = dataset.procedures.get(procedure_id) or abort(404)
+        page = max(1, request.args.get("pagina", 1, type=int))
+        last_page = max(1, -(-len(doc_ids) // config.docs_page_size))
+        rows = "".join(
+            f'<tr><td>{escape(dataset.documents[doc_id]["title"])}</td>'
+            f'<td><a href="/File/Documento/{doc_id}">Scarica</a></td></tr>'
+            for doc_id in doc_ids[(page - 1) * config.docs_page_size:page * config.docs_page_size]
+        )
+        href = lambda n: f"/it-IT/Oggetti/Documentazione/{folder_id}/{procedure_id}?pagina={n}"
+        body = f'<table class="Documentazione table">{rows}</table>' + pagination(page, last_page, href)
+        return html_response(layout(f"Documentazione {procedure_id}", body))
+
+    @app.route("/it-IT/Oggetti/MetadatoDocumento/<doc_id>")
+    def document_metadata(doc_id):
+        document = dataset.documents.get(doc_id) or abort(404)
+        body = (
+            f'<table class="table"><tr><td>Documento</td><td>{escape(document["title"])}</td></tr>'
+            f'<tr><td>Nome file</td><td>{escape(document["filename"])}</td></tr></table>'
+        )
+        return html_response(layout("Metadato documento", body))
+
+    @app.route("/File/Documento/<doc_id>", methods=["GET", "HEAD"])
+    def document_file(doc_id):
+        document = dataset.documents.get(doc_id) or abort(404)
+        size = document['size']
+        start, end = 0, size - 1
+        status = 200
+
+        match = re.match(r"bytes=(\d+)-(\d*)$", request.headers.get("Range", ""))
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            if start >= size:
+                return Response(status=416, headers={'Content-Range': f"bytes */{size}"})
+            status = 206
+
+        headers = {
+            'Content-Type': "application/pdf",
+            'Content-Disposition': f'attachment; filename="{document["filename"]}"',
+            'Content-Length': str(end - start + 1),
+            'Last-Modified': LAST_MODIFIED,
+            'ETag': f'"{doc_id}-{size}"',
+            'Accept-Ranges': "bytes",
+        }
+        if status == 206:
+            headers['Content-Range'] = f"bytes {start}-{end}/{size}"
+        if request.method == "HEAD":
+            return Response(status=status, headers=headers)
+
+        def body():
+            # Deterministic content generated chunk by chunk so large documents cost no memory
+            block = hashlib.sha256(doc_id.encode()).digest() * 2048
+            position = start
+            while position <= end:
+                offset = position % len(block)
+                chunk = block[offset:offset + min(len(block) - offset, end - position + 1)]
+                position += len(chunk)
+                yield chunk
+            count(bytes=end - start + 1)
+
+        return Response(body(), status=status, headers=headers, direct_passthrough=True)
+
+    @app.route("/__stats")
+    def portal_stats():
+        with stats_lock:
+            return dict(stats)
+
+    return app
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a generated stand-in for the VIA portal.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--projects", type=int, default=120, help="number of projects")
+    parser.add_argument("--procedures", type=int, default=2, help="procedures per project")
+    parser.add_argument("--documents", type=int, default=30, help="documents per procedure")
+    parser.add_argument("--docs-page-size", type=int, default=20, help="documents per procedure page")
+    parser.add_argument("--doc-size", type=int, default=256 * 1024, help="mean document size in bytes")
+    parser.add_argument("--latency", type=float, default=0.05, help="mean added latency per request in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    config = PortalConfig(args.projects, args.procedures, args.documents, args.docs_page_size,
+                          args.doc_size, args.latency, args.error_rate, args.seed)
+    create_app(config).run(host=args.host, port=args.port, threaded=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+# Constants
+CACHE_PATH = os.environ.get("VIA_CACHE_PATH", os.path.join("cache", "http_cache.sqlite"))
+CACHE_MAX_BYTES = 512 * 1024 * 1024  # Least recently used pages are evicted above this size
+
+# Time-to-live per URL pattern, first match wins; URLs matching nothing are never cached
+CACHE_TTLS: List[Tuple[str, int]] = [
+    (r"/Ricerca/", 15 * 60),                          # Search results change as projects are added
+    (r"/Oggetti/Documentazione/", 24 * 3600),         # Procedure document lists grow slowly
+    (r"/Oggetti/Info/", 7 * 24 * 3600),               # Project pages rarely change
+    (r"/Oggetti/MetadatoDocumento/", 30 * 24 * 3600), # Document metadata is immutable
+]
+
+# Headers that describe the transfer rather than the stored (already decoded) body
+HOP_HEADERS = {"content-encoding", "transfer-encoding", "content-length", "connection", "set-cookie"}
+
+class HttpCache:
+    """Persistent, size-bounded LRU cache of HTML responses shared between processes."""
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES,
+                 ttls: List[Tuple[str, int]] = CACHE_TTLS):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in ttls]
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    url TEXT PRIMARY KEY,
+                    status INTEGER NOT NULL,
+                    headers TEXT NOT NULL,
+                    encoding TEXT,
+                    body BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    stored_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+
+    def ttl_for(self, url: str) -> Optional[int]:
+        """Return the TTL for a URL, or None if it should not be cached."""
+        for pattern, ttl in self.ttls:
+            if pattern.search(url):
+                return ttl
+        return None
+
+    def lookup(self, url: str) -> Optional[Dict]:
+        """Return the cached entry for a URL, flagged with whether it is still fresh."""
+        ttl = self.ttl_for(url)
+        if ttl is None:
+            return None
+
+        now = time.time()
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT status, headers, encoding, body, stored_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (now, url))
+
+        status, headers, encoding, body, stored_at = row
+        return {
+            'url': url,
+            'status': status,
+            'headers': json.loads(headers),
+            'encoding': encoding,
+            'body': body,
+            'fresh': now - stored_at < ttl,
+        }
+
+    def store(self, url: str, response: requests.Response) -> None:
+        """Store a successful response body and its validators."""
+        if self.ttl_for(url) is None:
+            return
+
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in HOP_HEADERS}
+        body = response.content
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, response.status_code, json.dumps(headers), response.encoding or response.apparent_encoding,
+                 body, len(body), now, now)
+            )
+            self._evict()
+
+    def revalidated(self, url: str) -> None:
+        """Mark an entry as fresh again after the server answered 304 Not Modified."""
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE responses SET stored_at = ?, accessed_at = ? WHERE url = ?", (now, now, url))
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the cache fits in `max_bytes`."""
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        excess = total - self.max_bytes
+        victims = []
+        for url, size in self.conn.execute("SELECT url, size FROM responses ORDER BY accessed_at"):
+            victims.append((url,))
+            excess -= size
+            if excess <= 0:
+                break
+        self.conn.executemany("DELETE FROM responses WHERE url = ?", victims)
+        logger.info(f"Evicted {len(victims)} cached pages")
+
+def conditional_headers(entry: Dict) -> Dict[str, str]:
+    """Build If-None-Match/If-Modified-Since headers from a cached entry's validators."""
+    headers = {}
+    validators = CaseInsensitiveDict(entry['headers'])
+    if validators.get('ETag'):
+        headers['If-None-Match'] = validators['ETag']
+    if validators.get('Last-Modified'):
+        headers['If-Modified-Since'] = validators['Last-Modified']
+    return headers
+
+def build_response(entry: Dict) -> requests.Response:
+    """Rebuild a requests.Response from a cached entry."""
+    response = requests.Response()
+    response.status_code = entry['status']
+    response.headers = CaseInsensitiveDict(entry['headers'])
+    response.encoding = entry['encoding']
+    response.url = entry['url']
+    response.reason = "OK"
+    response._content = entry['body']
+    response.from_cache = True
+    return response
+
+_shared_cache: Optional[HttpCache] = None
+_shared_cache_lock = threading.Lock()
+
+def get_http_cache() -> HttpCache:
+    """Return the process-wide cache backed by CACHE_PATH."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = HttpCache()
+        return _shared_cache
@@ -0,0 +1,146 @@
+import time
+import uuid
+import queue
+import threading
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from crawler import crawl_projects
+from metrics import METRICS, Metrics
+from project_index import get_project_index
+from scraper import ScraperSession, get_session_pool, iter_projects
+
+logger = logging.getLogger(__name__)
+
+# Constants
+JOB_WORKERS = 2  # Crawls run at the same time; each one already fans out over the crawl pool
+JOB_HISTORY = 100  # Finished jobs kept in memory for status and result requests
+
+# Job statuses
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+def normalize_keyword(keyword: str) -> str:
+    """Normalize a keyword so equivalent searches share one job."""
+    return " ".join(keyword.lower().split())
+
+class Job:
+    """A keyword crawl tracked by the job queue."""
+
+    def __init__(self, keyword: str):
+        self.id = uuid.uuid4().hex
+        self.keyword = keyword
+        self.status = QUEUED
+        self.stage = None
+        self.progress = {'done': 0, 'total': 0}
+        self.results: Optional[List[Dict]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.metrics = Metrics(parent=METRICS)
+
+    def to_dict(self) -> Dict:
+        """Return the job's status fields (without results)."""
+        return {
+            'id': self.id,
+            'keyword': self.keyword,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': dict(self.progress),
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'metrics': self.metrics.summary(),
+        }
+
+def run_search_job(job: Job, session: ScraperSession) -> List[Dict]:
+    """Search projects for the job's keyword and crawl their documents."""
+    job.stage = "searching"
+    project_urls = list(iter_projects(job.keyword, session))
+
+    job.stage = "crawling"
+    job.progress = {'done': 0, 'total': len(project_urls)}
+
+    def update_progress(done: int, total: int) -> None:
+        job.progress = {'done': done, 'total': total}
+
+    return crawl_projects(project_urls, session, progress_callback=update_progress,
+                          index=get_project_index(), with_titles=True)
+
+class JobQueue:
+    """Background workers running crawl jobs, merging identical pending keywords."""
+
+    def __init__(self, workers: int = JOB_WORKERS,
+                 runner: Callable[[Job, ScraperSession], List[Dict]] = run_search_job):
+        self.workers = workers
+        self.runner = runner
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.active: Dict[str, Job] = {}
+        self.queue: "queue.Queue[Job]" = queue.Queue()
+        self.lock = threading.Lock()
+        self.threads: List[threading.Thread] = []
+
+    def _start(self) -> None:
+        """Start the worker threads on first use; callers must hold the lock."""
+        if self.threads:
+            return
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{n}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, keyword: str) -> Job:
+        """Queue a crawl for a keyword, or return the queued/running job for the same keyword."""
+        key = normalize_keyword(keyword)
+        with self.lock:
+            job = self.active.get(key)
+            if job is not None:
+                logger.info(f"Merging search for '{keyword}' into job {job.id}")
+                return job
+
+            job = Job(keyword)
+            self.jobs[job.id] = job
+            self.active[key] = job
+            self._prune()
+            self._start()
+        self.queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return a job by ID, or None if it is unknown or expired."""
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _prune(self) -> None:
+        """Forget the oldest finished jobs beyond JOB_HISTORY; callers must hold the lock."""
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in (DONE, FAILED)]
+        for job_id in finished[:max(0, len(finished) - JOB_HISTORY)]:
+            del self.jobs[job_id]
+
+    def _work(self) -> None:
+        """Run queued jobs one after another, each on a session leased from the shared pool."""
+        while True:
+            job = self.queue.get()
+            job.status = RUNNING
+            job.started_at = time.time()
+            logger.info(f"Starting job {job.id} for keyword='{job.keyword}'")
+            try:
+                # The leased session records into the job's metrics while it runs the job
+                with get_session_pool().lease(job.metrics) as session:
+                    job.results = self.runner(job, session)
+                job.status = DONE
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {e}")
+                job.error = str(e)
+                job.status = FAILED
+            finally:
+                job.finished_at = time.time()
+                logger.info(f"Job {job.id} metrics: {job.metrics.summary()}")
+                with self.lock:
+                    self.active.pop(normalize_keyword(job.keyword), None)
+                self.queue.task_done()
@@ -0,0 +1,61 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import scraper
+from extract import document_title
+from project_index import ProjectIndex, document_id_from_url, get_project_index
+from scraper import MAX_WORKERS, ScraperSession, probe_document
+
+logger = logging.getLogger(__name__)
+
+# Constants
+METADATA_ENDPOINT = "/it-IT/Oggetti/MetadatoDocumento/"
+PROBE_MAX_AGE = 24 * 3600  # Probed sizes and dates younger than this are answered from the index's probes
+
+def metadata_url(doc_id: str) -> str:
+    """Return the MetadatoDocumento page URL for a document ID."""
+    return f"{scraper.BASE_URL}{METADATA_ENDPOINT}{doc_id}"
+
+def fetch_document_title(doc_id: str, session: ScraperSession, strict: bool = False) -> Optional[str]:
+    """Get a document's title from its metadata page (None on failure, or raise with `strict`)."""
+    try:
+        resp = session.get(metadata_url(doc_id), timeout=10)
+        resp.raise_for_status()
+        with session.metrics.timer('via_parse_seconds', stage="metadata"):
+            return document_title(resp.text)
+    except Exception as e:
+        logger.error(f"Failed to get title for document {doc_id}: {e}")
+        if strict:
+            raise
+        return None
+
+def probe_documents(
+    doc_urls: List[str],
+    session: ScraperSession,
+    index: Optional[ProjectIndex] = None,
+    max_workers: int = MAX_WORKERS,
+    max_age: float = PROBE_MAX_AGE,
+) -> Dict[str, Optional[Dict]]:
+    """Collect filename, size, type and modification date for many documents without downloading them.
+
+    Documents probed within `max_age` are answered from `index` (the shared
+    project index by default), whether or not they were crawled; the rest are
+    probed concurrently with HEAD requests (see `scraper.probe_document`) and the
+    results stored back in the index. Failed probes map to None and are retried.
+    """
+    index = index or get_project_index()
+    doc_urls = list(dict.fromkeys(doc_urls))
+    known = index.probed_metadata([document_id_from_url(url) for url in doc_urls], max_age)
+    results = {url: known[document_id_from_url(url)] for url in doc_urls if document_id_from_url(url) in known}
+    missing = [url for url in doc_urls if url not in results]
+
+    if missing:
+        logger.info(f"Probing {len(missing)} documents ({len(results)} probed recently)")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for doc_url, metadata in zip(missing, executor.map(lambda url: probe_document(url, session), missing)):
+                results[doc_url] = metadata
+                if metadata is not None:
+                    index.add_probe(doc_url, metadata)
+
+    return {url: results.get(url) for url in doc_urls}
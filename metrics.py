@@ -0,0 +1,190 @@
+import re
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Constants
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]  # Seconds
+PARSE_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25]  # Seconds
+
+# Crawl stages, told apart by the portal path they request
+STAGES = [
+    (re.compile(r"/Ricerca/"), "search"),
+    (re.compile(r"/Oggetti/Info/"), "project"),
+    (re.compile(r"/Oggetti/Documentazione/"), "procedure"),
+    (re.compile(r"/Oggetti/MetadatoDocumento/"), "metadata"),
+    (re.compile(r"/File/Documento/"), "download"),
+]
+
+# Metric name => (type, help, histogram buckets)
+METRIC_TYPES = {
+    'via_requests_total': ("counter", "HTTP requests sent to the portal, by stage and status code.", None),
+    'via_request_seconds': ("histogram", "Latency of HTTP requests sent to the portal.", LATENCY_BUCKETS),
+    'via_response_bytes_total': ("counter", "Response bytes received from the portal (Content-Length for streamed bodies).", None),
+    'via_cache_lookups_total': ("counter", "HTTP cache lookups, by result (hit, revalidated, miss).", None),
+    'via_parse_seconds': ("histogram", "Time spent extracting links and fields from HTML pages.", PARSE_BUCKETS),
+    'via_retries_total': ("counter", "Requests retried after a failure.", None),
+    'via_crawl_task_seconds': ("histogram", "Duration of crawl tasks run by the worker pool.", LATENCY_BUCKETS),
+    'via_concurrency_limit': ("gauge", "Adaptive limit on in-flight requests, by host.", None),
+    'via_cache_warmups_total': ("counter", "Keywords and projects re-crawled by the off-peak cache warmer.", None),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def stage_for(url: str) -> str:
+    """Return the crawl stage a portal URL belongs to."""
+    for pattern, stage in STAGES:
+        if pattern.search(url):
+            return stage
+    return "other"
+
+class Metrics:
+    """Thread-safe counters, gauges and histograms, exported in the Prometheus text format.
+
+    A registry created with a `parent` forwards every sample to it, so a job can
+    keep its own figures while the process-wide registry keeps the totals.
+    """
+
+    def __init__(self, parent: Optional["Metrics"] = None):
+        self.parent = parent
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.gauges: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], List] = {}  # [bucket counts, sum, count]
+        self.lock = threading.Lock()
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+        if self.parent is not None:
+            self.parent.inc(name, amount, **labels)
+
+    def set(self, name: str, value: float, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.gauges[key] = value
+        if self.parent is not None:
+            self.parent.set(name, value, **labels)
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        buckets = METRIC_TYPES[name][2]
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            histogram[0][bisect.bisect_left(buckets, value)] += 1
+            histogram[1] += value
+            histogram[2] += 1
+        if self.parent is not None:
+            self.parent.observe(name, value, **labels)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """Observe the duration of the `with` block, even when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+        with self.lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            histograms = {key: [list(h[0]), h[1], h[2]] for key, h in self.histograms.items()}
+
+        lines = []
+        for name, (kind, help_text, buckets) in METRIC_TYPES.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind in ("counter", "gauge"):
+                for (metric, labels), value in sorted((counters if kind == "counter" else gauges).items()):
+                    if metric == name:
+                        lines.append(f"{name}{format_labels(labels)} {value:g}")
+                continue
+            for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(buckets + [float("inf")], counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{name}_bucket{format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(labels)} {total:g}")
+                lines.append(f"{name}_count{format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> Dict[str, Dict]:
+        """Summarize requests, latency, bytes, cache use, parse time and retries per stage."""
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = {key: [list(h[0]), h[1], h[2]] for key, h in self.histograms.items()}
+
+        stages: Dict[str, Dict] = {}
+
+        def stage_stats(labels: Labels) -> Dict:
+            stage = dict(labels).get('stage', "other")
+            return stages.setdefault(stage, {
+                'requests': 0, 'errors': 0, 'bytes': 0, 'cache_hits': 0, 'cache_revalidated': 0,
+                'cache_misses': 0, 'retries': 0, 'latency_mean': None, 'latency_p95': None,
+                'parse_seconds': 0.0, 'task_seconds': 0.0,
+            })
+
+        for (name, labels), value in counters.items():
+            stats = stage_stats(labels)
+            if name == 'via_requests_total':
+                stats['requests'] += int(value)
+                status = dict(labels).get('status', "")
+                if not status.isdigit() or int(status) >= 400:
+                    stats['errors'] += int(value)
+            elif name == 'via_response_bytes_total':
+                stats['bytes'] += int(value)
+            elif name == 'via_cache_lookups_total':
+                result = dict(labels).get('result')
+                stats[{'hit': 'cache_hits', 'revalidated': 'cache_revalidated'}.get(result, 'cache_misses')] += int(value)
+            elif name == 'via_retries_total':
+                stats['retries'] += int(value)
+
+        for (name, labels), (counts, total, count) in histograms.items():
+            stats = stage_stats(labels)
+            if name == 'via_request_seconds' and count:
+                stats['latency_mean'] = total / count
+                stats['latency_p95'] = quantile_upper_bound(METRIC_TYPES[name][2], counts, 0.95)
+            elif name == 'via_parse_seconds':
+                stats['parse_seconds'] += total
+            elif name == 'via_crawl_task_seconds':
+                stats['task_seconds'] += total
+
+        for stats in stages.values():
+            lookups = stats['cache_hits'] + stats['cache_revalidated'] + stats['cache_misses']
+            stats['cache_hit_ratio'] = (stats['cache_hits'] + stats['cache_revalidated']) / lookups if lookups else None
+        return dict(sorted(stages.items()))
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+def quantile_upper_bound(buckets: List[float], counts: List[int], q: float) -> Optional[float]:
+    """Estimate a quantile as the upper bound of the bucket it falls in (None past the last bucket)."""
+    target = q * sum(counts)
+    cumulative = 0
+    for bound, count in zip(buckets, counts):
+        cumulative += count
+        if cumulative >= target:
+            return bound
+    return None
+
+# Process-wide registry served at /metrics
+METRICS = Metrics()
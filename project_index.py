@@ -0,0 +1,317 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+import logging
+import urllib.parse
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Constants
+INDEX_PATH = os.environ.get("VIA_INDEX_PATH", os.path.join("cache", "index.sqlite"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    folder_id TEXT PRIMARY KEY,
+    project_code TEXT,
+    url TEXT NOT NULL,
+    title TEXT,
+    details TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS projects_code ON projects (project_code);
+
+CREATE TABLE IF NOT EXISTS procedures (
+    url TEXT PRIMARY KEY,
+    folder_id TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS procedures_folder ON procedures (folder_id);
+
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    folder_id TEXT NOT NULL,
+    procedure_url TEXT NOT NULL,
+    title TEXT,
+    filename TEXT,
+    size TEXT,
+    type TEXT,
+    last_modified TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_folder ON documents (folder_id);
+CREATE INDEX IF NOT EXISTS documents_procedure ON documents (procedure_url);
+
+CREATE TABLE IF NOT EXISTS probes (
+    doc_id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    filename TEXT,
+    size INTEGER,
+    type TEXT,
+    last_modified TEXT,
+    probed_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS listings (
+    url TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    links TEXT NOT NULL,
+    checked_at REAL NOT NULL
+);
+"""
+
+# Full-text indexes for offline keyword search; rowids follow the projects and documents tables
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS projects_fts USING fts5(body, tokenize = 'unicode61 remove_diacritics 2');
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(body, tokenize = 'unicode61 remove_diacritics 2');
+"""
+
+# Text indexed for each row: (FTS table, key column, SELECT of rowid and body)
+PROJECT_SEARCH = ("projects_fts", "folder_id", """
+    SELECT rowid, COALESCE(title, '') || ' ' || COALESCE(project_code, '') || ' ' || folder_id || ' ' ||
+        COALESCE((SELECT group_concat(value, ' ') FROM json_each(details)), '')
+    FROM projects""")
+DOCUMENT_SEARCH = ("documents_fts", "doc_id", """
+    SELECT rowid, COALESCE(title, '') || ' ' || COALESCE(filename, '') || ' ' || doc_id
+    FROM documents""")
+
+def search_query(text: str) -> str:
+    """Turn free text into an FTS5 query matching every word as a prefix."""
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", text))
+
+def folder_id_from_url(project_url: str) -> str:
+    """Return the folder ID at the end of an Oggetti/Info URL."""
+    return urllib.parse.urlsplit(project_url).path.rstrip('/').split('/')[-1]
+
+def document_id_from_url(doc_url: str) -> str:
+    """Return the document ID at the end of a File/Documento URL."""
+    return urllib.parse.urlsplit(doc_url).path.rstrip('/').split('/')[-1]
+
+class ProjectIndex:
+    """Local SQLite index of projects, their procedures and documents.
+
+    Filled incrementally by the crawler so lookups by project code, folder ID or
+    document ID can be answered without contacting the portal.
+    """
+
+    def __init__(self, path: str = INDEX_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(SCHEMA)
+            self.conn.executescript(SEARCH_SCHEMA)
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict]:
+        with self.lock:
+            return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def add_project(self, info: Dict) -> None:
+        """Record a project as returned by `get_project_info`."""
+        with self.lock, self.conn:
+            self.conn.execute(
+                """INSERT INTO projects (folder_id, project_code, url, title, details, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(folder_id) DO UPDATE SET
+                       project_code = COALESCE(excluded.project_code, project_code),
+                       title = COALESCE(excluded.title, title),
+                       details = COALESCE(excluded.details, details),
+                       url = excluded.url, updated_at = excluded.updated_at""",
+                (info['folder_id'], info['project_code'], info['url'], info.get('title'),
+                 json.dumps(info['details'], ensure_ascii=False) if info.get('details') else None, time.time())
+            )
+            self._index_rows(PROJECT_SEARCH, [info['folder_id']])
+
+    def add_procedures(self, project_url: str, procedure_urls: List[str]) -> None:
+        """Record the procedures linked from a project page."""
+        folder_id = folder_id_from_url(project_url)
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO procedures (url, folder_id, updated_at) VALUES (?, ?, ?)",
+                [(url, folder_id, now) for url in procedure_urls]
+            )
+
+    def add_documents(self, documents: List[Dict]) -> None:
+        """Record crawled document records, keeping metadata gathered earlier."""
+        now = time.time()
+        rows = [
+            (document_id_from_url(doc['url']), doc['url'], folder_id_from_url(doc['project_url']),
+             doc['procedure_url'], doc.get('title'), now)
+            for doc in documents
+        ]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                """INSERT INTO documents (doc_id, url, folder_id, procedure_url, title, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(doc_id) DO UPDATE SET
+                       url = excluded.url, folder_id = excluded.folder_id,
+                       procedure_url = excluded.procedure_url,
+                       title = COALESCE(excluded.title, title), updated_at = excluded.updated_at""",
+                rows
+            )
+            self._index_rows(DOCUMENT_SEARCH, [row[0] for row in rows])
+
+    def update_document_metadata(self, doc_url: str, metadata: Dict) -> None:
+        """Store metadata (title, filename, size, type, last_modified) for a known document."""
+        fields = [key for key in ('title', 'filename', 'size', 'type', 'last_modified') if metadata.get(key)]
+        if not fields:
+            return
+        with self.lock, self.conn:
+            self.conn.execute(
+                f"UPDATE documents SET {', '.join(f'{key} = ?' for key in fields)} WHERE doc_id = ?",
+                [metadata[key] for key in fields] + [document_id_from_url(doc_url)]
+            )
+            self._index_rows(DOCUMENT_SEARCH, [document_id_from_url(doc_url)])
+
+    def add_probe(self, doc_url: str, metadata: Dict) -> None:
+        """Record a document probe (filename, size, type, last_modified), also filling in an indexed document."""
+        with self.lock, self.conn:
+            self.conn.execute(
+                """INSERT OR REPLACE INTO probes (doc_id, url, filename, size, type, last_modified, probed_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (document_id_from_url(doc_url), doc_url, metadata.get('filename'), metadata.get('size'),
+                 metadata.get('type'), metadata.get('last_modified'), time.time())
+            )
+        self.update_document_metadata(doc_url, metadata)
+
+    def add_crawl_result(self, result: Dict) -> None:
+        """Record one project result produced by `crawler.crawl_projects`."""
+        if result.get('project_info'):
+            self.add_project(result['project_info'])
+        self.add_procedures(result['project_url'], result['procedure_urls'])
+        self.add_documents(result['documents'])
+
+    def remove_documents(self, doc_urls: List[str]) -> None:
+        """Forget documents that are no longer listed by their procedure."""
+        doc_ids = [(document_id_from_url(url),) for url in doc_urls]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "DELETE FROM documents_fts WHERE rowid IN (SELECT rowid FROM documents WHERE doc_id = ?)", doc_ids
+            )
+            self.conn.executemany("DELETE FROM documents WHERE doc_id = ?", doc_ids)
+
+    def _index_rows(self, search: Tuple[str, str, str], keys: List[str]) -> None:
+        """Refresh the search entries of the given rows; callers must hold the lock in a transaction."""
+        fts_table, key_column, body_sql = search
+        for key in keys:
+            for rowid, body in self.conn.execute(f"{body_sql} WHERE {key_column} = ?", (key,)).fetchall():
+                self.conn.execute(f"INSERT OR REPLACE INTO {fts_table} (rowid, body) VALUES (?, ?)", (rowid, body))
+
+    def search(self, text: str, limit: int = 50, documents_per_project: int = 5) -> List[Dict]:
+        """Find indexed projects whose title, code, details or documents match every word of `text`.
+
+        Projects matching on their own fields come first, then projects with
+        matching documents, each ordered by relevance. Every result carries up to
+        `documents_per_project` matching documents and their total count.
+        """
+        query = search_query(text)
+        if not query:
+            return []
+
+        projects = self._query(
+            """SELECT p.folder_id, p.project_code, p.url, p.title, p.details, bm25(projects_fts) AS rank
+               FROM projects_fts JOIN projects p ON p.rowid = projects_fts.rowid
+               WHERE projects_fts MATCH ? ORDER BY rank""", (query,)
+        )
+        documents = self._query(
+            """SELECT d.doc_id, d.url, d.folder_id, d.procedure_url, d.title, d.filename, bm25(documents_fts) AS rank
+               FROM documents_fts JOIN documents d ON d.rowid = documents_fts.rowid
+               WHERE documents_fts MATCH ? ORDER BY rank""", (query,)
+        )
+
+        results: Dict[str, Dict] = {}
+        for project in projects:
+            details = project.pop('details')
+            results[project['folder_id']] = {
+                **project, 'details': json.loads(details) if details else {},
+                'matched_project': True, 'documents': [], 'document_matches': 0,
+            }
+        for doc in documents:
+            result = results.get(doc['folder_id'])
+            if result is None:
+                project = self.find_by_folder(doc['folder_id']) or {'folder_id': doc['folder_id'], 'project_code': None,
+                                                                   'url': None, 'title': None, 'details': None}
+                result = results[doc['folder_id']] = {
+                    **project, 'details': json.loads(project['details']) if project.get('details') else {},
+                    'rank': doc['rank'], 'matched_project': False, 'documents': [], 'document_matches': 0,
+                }
+                result.pop('updated_at', None)
+            result['document_matches'] += 1
+            if len(result['documents']) < documents_per_project:
+                result['documents'].append(doc)
+
+        ranked = sorted(results.values(), key=lambda result: (not result['matched_project'], result['rank']))
+        return ranked[:limit]
+
+    def get_listing(self, url: str) -> Optional[Tuple[str, List[str]]]:
+        """Return the fingerprint and links recorded for a listing's first page."""
+        rows = self._query("SELECT fingerprint, links FROM listings WHERE url = ?", (url,))
+        return (rows[0]['fingerprint'], json.loads(rows[0]['links'])) if rows else None
+
+    def set_listing(self, url: str, fingerprint: str, links: List[str]) -> None:
+        """Record the fingerprint of a listing's first page and all of its links."""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO listings (url, fingerprint, links, checked_at) VALUES (?, ?, ?, ?)",
+                (url, fingerprint, json.dumps(links), time.time())
+            )
+
+    def document_titles(self, doc_ids: List[str]) -> Dict[str, str]:
+        """Return the known titles of the given documents."""
+        titles = {}
+        for start in range(0, len(doc_ids), 500):
+            batch = doc_ids[start:start + 500]
+            titles.update({
+                row['doc_id']: row['title'] for row in self._query(
+                    f"SELECT doc_id, title FROM documents WHERE title IS NOT NULL "
+                    f"AND doc_id IN ({', '.join('?' * len(batch))})", tuple(batch)
+                )
+            })
+        return titles
+
+    def probed_metadata(self, doc_ids: List[str], max_age: float) -> Dict[str, Dict]:
+        """Return the probes of the given documents made within the last `max_age` seconds."""
+        metadata = {}
+        since = time.time() - max_age
+        for start in range(0, len(doc_ids), 500):
+            batch = doc_ids[start:start + 500]
+            for row in self._query(
+                f"SELECT doc_id, url, filename, size, type, last_modified FROM probes "
+                f"WHERE probed_at >= ? AND doc_id IN ({', '.join('?' * len(batch))})", (since, *batch)
+            ):
+                metadata[row.pop('doc_id')] = row
+        return metadata
+
+    def find_by_code(self, project_code: str) -> Optional[Dict]:
+        """Look up a project by its procedure code."""
+        rows = self._query("SELECT * FROM projects WHERE project_code = ? LIMIT 1", (project_code,))
+        return rows[0] if rows else None
+
+    def find_by_folder(self, folder_id: str) -> Optional[Dict]:
+        """Look up a project by its folder ID."""
+        rows = self._query("SELECT * FROM projects WHERE folder_id = ?", (folder_id,))
+        return rows[0] if rows else None
+
+    def documents_for_project(self, folder_id: str) -> List[Dict]:
+        """Return the documents recorded for a project."""
+        return self._query("SELECT * FROM documents WHERE folder_id = ? ORDER BY rowid", (folder_id,))
+
+_shared_index: Optional[ProjectIndex] = None
+_shared_index_lock = threading.Lock()
+
+def get_project_index() -> ProjectIndex:
+    """Return the process-wide index backed by INDEX_PATH."""
+    global _shared_index
+    with _shared_index_lock:
+        if _shared_index is None:
+            _shared_index = ProjectIndex()
+        return _shared_index
@@ -0,0 +1,123 @@
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional
+from urllib.parse import unquote
+
+from project_index import folder_id_from_url
+
+# Constants
+PAGE_SIZE = 50  # Documents rendered per results page
+
+def title_for(doc_url: str, title: Optional[str] = None) -> str:
+    """Return a document's display title, falling back to the file name in its URL."""
+    if title:
+        return title
+    return unquote(doc_url.split('fileName=')[-1]) if 'fileName=' in doc_url else doc_url.split('/')[-1]
+
+class ResultStore:
+    """Columnar store of crawled document records.
+
+    Each document is a row index into parallel columns: its URL and title, and
+    array offsets into interned tables of project URLs, procedure URLs and crawl
+    timestamps, which are shared by every document that repeats them. Rows are
+    materialized as dicts only for the page being shown.
+    """
+
+    def __init__(self):
+        self.urls: List[str] = []
+        self.titles: List[Optional[str]] = []
+        self.search_keys: List[str] = []  # Lowercased display title, matched by `filter`
+        self.project_ids = array('I')
+        self.procedure_ids = array('I')
+        self.date_ids = array('I')
+        self.project_urls: List[str] = []
+        self.procedure_urls: List[str] = []
+        self.dates: List[str] = []
+        self.project_info: List[Optional[Dict]] = []  # By project ID, as returned by `get_project_info`
+        self._offsets: Dict[str, Dict[str, int]] = {'project': {}, 'procedure': {}, 'date': {}}
+        self._rows: Dict[str, int] = {}  # Document URL => row
+        self._last_filter: Optional[tuple] = None  # ((text, folder_id, row count), rows) of the last `filter`
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    def _intern(self, kind: str, table: List[str], value: str) -> int:
+        offsets = self._offsets[kind]
+        offset = offsets.get(value)
+        if offset is None:
+            offset = offsets[value] = len(table)
+            table.append(value)
+        return offset
+
+    def _project(self, project_url: str) -> int:
+        project_id = self._intern('project', self.project_urls, project_url)
+        if project_id == len(self.project_info):
+            self.project_info.append(None)
+        return project_id
+
+    def add_project(self, project_url: str, project_info: Optional[Dict]) -> None:
+        self.project_info[self._project(project_url)] = project_info
+
+    def add(self, doc: Dict) -> None:
+        """Add a document record as yielded by `iter_crawl`; a URL already held is ignored."""
+        if doc['url'] in self._rows:
+            return
+        self._rows[doc['url']] = len(self.urls)
+        self.urls.append(doc['url'])
+        self.titles.append(doc.get('title'))
+        self.search_keys.append(title_for(doc['url'], doc.get('title')).lower())
+        self.project_ids.append(self._project(doc['project_url']))
+        self.procedure_ids.append(self._intern('procedure', self.procedure_urls, doc['procedure_url']))
+        self.date_ids.append(self._intern('date', self.dates, doc.get('date_found', "")))
+
+    def extend(self, docs: Iterable[Dict]) -> None:
+        for doc in docs:
+            self.add(doc)
+
+    def row(self, i: int) -> Dict:
+        """Materialize row `i` as a document dict, as `iter_crawl` yields it."""
+        return {
+            'url': self.urls[i],
+            'project_url': self.project_urls[self.project_ids[i]],
+            'procedure_url': self.procedure_urls[self.procedure_ids[i]],
+            'date_found': self.dates[self.date_ids[i]],
+            'title': self.titles[i],
+        }
+
+    def __iter__(self) -> Iterator[Dict]:
+        return (self.row(i) for i in range(len(self.urls)))
+
+    def project_counts(self) -> Dict[str, int]:
+        """Return the number of documents per project folder ID."""
+        counts = [0] * len(self.project_urls)
+        for project_id in self.project_ids:
+            counts[project_id] += 1
+        return {folder_id_from_url(url): count for url, count in zip(self.project_urls, counts) if count}
+
+    def filter(self, text: str = "", folder_id: Optional[str] = None) -> List[int]:
+        """Return the rows whose title contains `text`, limited to one project when given.
+
+        The last result is kept, so paging through it does not scan the store again.
+        """
+        key = (text.strip().lower(), folder_id or None, len(self.urls))
+        if self._last_filter is not None and self._last_filter[0] == key:
+            return self._last_filter[1]
+
+        needle, folder_id, _ = key
+        if folder_id:
+            wanted = {i for i, url in enumerate(self.project_urls) if folder_id_from_url(url) == folder_id}
+            rows = [i for i, project_id in enumerate(self.project_ids) if project_id in wanted]
+        else:
+            rows = list(range(len(self.urls)))
+        if needle:
+            keys = self.search_keys
+            rows = [i for i in rows if needle in keys[i]]
+        self._last_filter = (key, rows)
+        return rows
+
+    def page(self, rows: List[int], page: int, page_size: int = PAGE_SIZE) -> List[Dict]:
+        """Materialize the documents on a 1-based page of `rows`."""
+        start = (max(page, 1) - 1) * page_size
+        return [self.row(i) for i in rows[start:start + page_size]]
+
+def page_count(total: int, page_size: int = PAGE_SIZE) -> int:
+    return max(1, -(-total // page_size))
@@ -0,0 +1,299 @@
+import os
+import time
+import socket
+import sqlite3
+import logging
+import argparse
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from crawler import crawl_projects
+from jobs import normalize_keyword
+from metrics import METRICS, Metrics
+from project_index import ProjectIndex, get_project_index
+from scraper import ConcurrencyLimiter, RateLimiter, ScraperSession, iter_projects
+
+logger = logging.getLogger(__name__)
+
+# Constants
+USAGE_PATH = os.environ.get("VIA_USAGE_PATH", os.path.join("cache", "usage.sqlite"))
+WARM_HOURS = os.environ.get("VIA_WARM_HOURS", "1-6")  # Off-peak local hours, start inclusive, end exclusive ("22-6" wraps)
+WARM_KEYWORDS = 20  # Most searched keywords re-crawled per pass
+WARM_PROJECTS = 50  # Most recently viewed projects re-crawled per pass
+WARM_WORKERS = 2  # Crawl workers and in-flight requests for warming
+WARM_RATE = float(os.environ.get("VIA_WARM_RATE", "1.0"))  # Warming requests per second, separate from the apps' limits
+POPULARITY_WINDOW = 14 * 24 * 3600  # Searches older than this no longer count towards popularity
+WARM_MAX_AGE = 12 * 3600  # Keywords and projects warmed more recently than this are skipped
+WARM_CHECK_INTERVAL = 5 * 60  # Seconds between checks for the off-peak window
+WARM_LEASE = 2 * 3600  # A warming pass holds the usage log lease this long, renewed after every item
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS searches (
+    keyword TEXT NOT NULL,
+    searched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS searches_time ON searches (searched_at);
+
+CREATE TABLE IF NOT EXISTS project_views (
+    project_url TEXT PRIMARY KEY,
+    views INTEGER NOT NULL,
+    viewed_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS warmed (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    warmed_at REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+);
+
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+# Warmed item kinds
+KEYWORD = "keyword"
+PROJECT = "project"
+
+def parse_hours(hours: str) -> Tuple[int, int]:
+    """Parse an "<start>-<end>" hour range such as "1-6" or "22-6"."""
+    start, end = (int(part) % 24 for part in hours.split("-", 1))
+    return start, end
+
+def in_window(hours: str = WARM_HOURS, now: Optional[float] = None) -> bool:
+    """Whether the local time falls in the off-peak hour range."""
+    start, end = parse_hours(hours)
+    hour = time.localtime(now).tm_hour
+    return start <= hour < end if start <= end else hour >= start or hour < end
+
+class UsageLog:
+    """Searches and project views recorded by the apps, and when each was last warmed."""
+
+    def __init__(self, path: str = USAGE_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(SCHEMA)
+
+    def record_search(self, keyword: str) -> None:
+        keyword = normalize_keyword(keyword)
+        if not keyword:
+            return
+        with self.lock, self.conn:
+            self.conn.execute("INSERT INTO searches (keyword, searched_at) VALUES (?, ?)", (keyword, time.time()))
+
+    def record_project_view(self, project_url: str) -> None:
+        with self.lock, self.conn:
+            self.conn.execute(
+                """INSERT INTO project_views (project_url, views, viewed_at) VALUES (?, 1, ?)
+                   ON CONFLICT(project_url) DO UPDATE SET views = views + 1, viewed_at = excluded.viewed_at""",
+                (project_url, time.time())
+            )
+
+    def popular_keywords(self, limit: int, window: float = POPULARITY_WINDOW,
+                         max_age: float = WARM_MAX_AGE) -> List[str]:
+        """Return the most searched keywords within `window` that were not warmed within `max_age`."""
+        now = time.time()
+        with self.lock:
+            rows = self.conn.execute(
+                """SELECT s.keyword FROM searches s
+                   LEFT JOIN warmed w ON w.kind = ? AND w.key = s.keyword
+                   WHERE s.searched_at >= ? AND (w.warmed_at IS NULL OR w.warmed_at < ?)
+                   GROUP BY s.keyword ORDER BY COUNT(*) DESC, MAX(s.searched_at) DESC LIMIT ?""",
+                (KEYWORD, now - window, now - max_age, limit)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def recent_projects(self, limit: int, window: float = POPULARITY_WINDOW,
+                        max_age: float = WARM_MAX_AGE) -> List[str]:
+        """Return the most recently viewed projects within `window` that were not warmed within `max_age`."""
+        now = time.time()
+        with self.lock:
+            rows = self.conn.execute(
+                """SELECT v.project_url FROM project_views v
+                   LEFT JOIN warmed w ON w.kind = ? AND w.key = v.project_url
+                   WHERE v.viewed_at >= ? AND (w.warmed_at IS NULL OR w.warmed_at < ?)
+                   ORDER BY v.viewed_at DESC LIMIT ?""",
+                (PROJECT, now - window, now - max_age, limit)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def mark_warmed(self, kind: str, keys: List[str]) -> None:
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO warmed (kind, key, warmed_at) VALUES (?, ?, ?)",
+                                  [(kind, key, now) for key in keys])
+
+    def acquire_lease(self, name: str, holder: str, ttl: float) -> bool:
+        """Take or renew a lease shared by every process using this log; False while another holder has it."""
+        now = time.time()
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                """INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?)
+                   ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+                   WHERE leases.holder = excluded.holder OR leases.expires_at < ?""",
+                (name, holder, now + ttl, now)
+            )
+            return cursor.rowcount > 0
+
+    def release_lease(self, name: str, holder: str) -> None:
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder))
+
+    def prune(self, window: float = POPULARITY_WINDOW) -> None:
+        """Forget searches and views that no longer count towards popularity."""
+        since = time.time() - window
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM searches WHERE searched_at < ?", (since,))
+            self.conn.execute("DELETE FROM project_views WHERE viewed_at < ?", (since,))
+
+class CacheWarmer:
+    """Re-crawls popular keywords and recently viewed projects during off-peak hours.
+
+    Warming runs a delta crawl that revalidates every listing page against the
+    portal, unchanged ones included, so the HTTP cache of each page and the index
+    are fresh when users search again. It runs in its own process, `python
+    scheduler.py` or cron with `--now`, so it cannot share the apps' limiters:
+    its requests are capped at WARM_RATE instead. A lease in the usage log keeps
+    a second warmer from running a pass at the same time.
+    """
+
+    def __init__(self, usage: Optional[UsageLog] = None, index: Optional[ProjectIndex] = None,
+                 hours: str = WARM_HOURS):
+        self.usage = usage or UsageLog()
+        self.index = index or get_project_index()
+        self.hours = hours
+        parse_hours(hours)  # Fail early on a malformed range
+        self.stop = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{id(self)}"
+
+    def record_search(self, keyword: str) -> None:
+        try:
+            self.usage.record_search(keyword)
+        except Exception as e:
+            logger.error(f"Failed to record search '{keyword}': {e}")
+
+    def record_project_view(self, project_url: str) -> None:
+        try:
+            self.usage.record_project_view(project_url)
+        except Exception as e:
+            logger.error(f"Failed to record view of {project_url}: {e}")
+
+    def session(self) -> ScraperSession:
+        """Return a session throttled to the warming rate and concurrency."""
+        return ScraperSession(rate_limiter=RateLimiter(rate=WARM_RATE, burst=1),
+                              concurrency=ConcurrencyLimiter(initial=WARM_WORKERS, maximum=WARM_WORKERS),
+                              metrics=Metrics(parent=METRICS))
+
+    def start(self) -> None:
+        """Start the background thread (once)."""
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="cache-warmer", daemon=True)
+                self.thread.start()
+
+    def _run(self) -> None:
+        while not self.stop.is_set():
+            if in_window(self.hours):
+                try:
+                    session = self.session()
+                    try:
+                        self.warm(session)
+                    finally:
+                        session.close()
+                except Exception as e:
+                    logger.error(f"Cache warming failed: {e}")
+            self.stop.wait(WARM_CHECK_INTERVAL)
+
+    def warm(self, session: ScraperSession, force: bool = False) -> Dict[str, int]:
+        """Warm the most popular keywords, then the recently viewed projects.
+
+        Stops between items once the off-peak window closes, unless `force`.
+        Projects shared by several keywords are crawled once per pass. Does
+        nothing while another warmer holds the usage log lease.
+        """
+        if not self.usage.acquire_lease("warm", self.holder, WARM_LEASE):
+            logger.info("Another cache warmer is running, skipping this pass")
+            return {'keywords': 0, 'projects': 0}
+        try:
+            return self._warm(session, force)
+        finally:
+            self.usage.release_lease("warm", self.holder)
+
+    def _warm(self, session: ScraperSession, force: bool) -> Dict[str, int]:
+        self.usage.prune()
+        stats = {'keywords': 0, 'projects': 0}
+        crawled = set()
+
+        for keyword in self.usage.popular_keywords(WARM_KEYWORDS):
+            if not force and not in_window(self.hours):
+                logger.info("Off-peak window closed, stopping cache warming")
+                return stats
+            if not self.usage.acquire_lease("warm", self.holder, WARM_LEASE):
+                logger.warning("Cache warming lease lost, stopping this pass")
+                return stats
+            logger.info(f"Warming keyword '{keyword}'")
+            found = iter_projects(keyword, session, delta_state=self.index, revalidate=True)
+            project_urls = [url for url in dict.fromkeys(found) if url not in crawled]
+            crawl_projects(project_urls, session, max_workers=WARM_WORKERS, index=self.index,
+                           delta=True, with_titles=True, revalidate=True)
+            crawled.update(project_urls)
+            self.usage.mark_warmed(KEYWORD, [keyword])
+            session.metrics.inc('via_cache_warmups_total', kind=KEYWORD)
+            stats['keywords'] += 1
+            stats['projects'] += len(project_urls)
+
+        if not force and not in_window(self.hours):
+            return stats
+        if not self.usage.acquire_lease("warm", self.holder, WARM_LEASE):
+            logger.warning("Cache warming lease lost, stopping this pass")
+            return stats
+        recent = self.usage.recent_projects(WARM_PROJECTS)
+        project_urls = [url for url in recent if url not in crawled]
+        if project_urls:
+            logger.info(f"Warming {len(project_urls)} recently viewed projects")
+            crawl_projects(project_urls, session, max_workers=WARM_WORKERS, index=self.index,
+                           delta=True, with_titles=True, revalidate=True)
+            session.metrics.inc('via_cache_warmups_total', len(project_urls), kind=PROJECT)
+            stats['projects'] += len(project_urls)
+        self.usage.mark_warmed(PROJECT, recent)
+        logger.info(f"Cache warming pass done: {stats}")
+        return stats
+
+_shared_warmer: Optional[CacheWarmer] = None
+_shared_warmer_lock = threading.Lock()
+
+def get_cache_warmer() -> CacheWarmer:
+    """Return the process-wide cache warmer (its thread is started with `start()`)."""
+    global _shared_warmer
+    with _shared_warmer_lock:
+        if _shared_warmer is None:
+            _shared_warmer = CacheWarmer()
+        return _shared_warmer
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Warm the cache for popular keywords and recently viewed projects.")
+    parser.add_argument("--now", action="store_true", help="run one pass right away, ignoring the off-peak window")
+    args = parser.parse_args()
+
+    warmer = get_cache_warmer()
+    if args.now:
+        session = warmer.session()
+        try:
+            warmer.warm(session, force=True)
+        finally:
+            session.close()
+        return
+    warmer.start()
+    warmer.thread.join()
+
+if __name__ == '__main__':
+    main()
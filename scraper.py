@@ -1,21 +1,51 @@
 import os
 import re
 import time
+import hashlib
+import threading
+import random
 import urllib.parse
+import zipfile
 import requests
-from bs4 import BeautifulSoup
-from typing import Tuple, List, Dict, Optional
+from requests.adapters import HTTPAdapter
+from typing import Callable, Iterator, List, Dict, Optional
 import logging
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from extract import Page, info_fields, procedure_code, project_title
+from http_cache import HttpCache, build_response, conditional_headers, get_http_cache
+from metrics import METRICS, Metrics, stage_for
+from project_index import ProjectIndex
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Constants
-BASE_URL = "https://va.mite.gov.it"
+BASE_URL = os.environ.get("VIA_BASE_URL", "https://va.mite.gov.it").rstrip("/")  # Overridable to target a local fake portal
 SEARCH_ENDPOINT = "/it-IT/Ricerca/ViaLibera"
 DOWNLOAD_FOLDER = "downloads"
-DELAY_BETWEEN_REQUESTS = 1.0  # Reduced from 2.0 since we're using sessions effectively
+REQUESTS_PER_SECOND = 4.0  # Sustained request rate allowed per host
+RATE_LIMIT_BURST = 4  # Requests that may be sent back-to-back before throttling
+DOWNLOAD_CHUNK_SIZE = 256 * 1024  # Bytes held in memory per in-flight download
+MAX_WORKERS = 8  # Worker threads used by the concurrent crawl engine
+PARALLEL_PAGINATION = True  # Fetch remaining result pages concurrently once the page count is known
+REQUEST_RETRIES = 3  # Extra attempts for a GET that failed with a connection error, 429 or 5xx
+RETRY_BACKOFF = 0.5  # Base retry delay in seconds, doubled per attempt and jittered
+RETRY_BACKOFF_MAX = 30.0  # Upper bound for a retry delay, including Retry-After
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_CONCURRENCY = 2 * MAX_WORKERS  # Ceiling for in-flight requests per host under adaptive concurrency
+LATENCY_TOLERANCE = 2.0  # Recent latency above this multiple of the baseline counts as congestion
+COOKIE_MAX_AGE = 20 * 60  # Seconds before session cookies are refreshed from the home page
+REJECTED_STATUSES = {401, 403, 440}  # Responses meaning the portal no longer accepts the session cookies
+SESSION_POOL_SIZE = 4  # Idle warm sessions kept for reuse
+PROBE_FALLBACK_STATUSES = {405, 501}  # HEAD answers that call for a one-byte ranged GET instead
+# Already-compressed formats that deflate cannot shrink; archived as-is to save CPU
+STORED_EXTENSIONS = {
+    ".pdf", ".p7m", ".zip", ".rar", ".7z", ".gz", ".tgz", ".bz2", ".xz",
+    ".jpg", ".jpeg", ".png", ".gif", ".tif", ".tiff", ".mp4", ".docx", ".xlsx", ".pptx", ".odt", ".ods",
+}
 
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -25,14 +55,312 @@ HEADERS = {
     'Upgrade-Insecure-Requests': '1',
 }
 
+class TokenBucket:
+    """Thread-safe token bucket refilled at `rate` tokens per second."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a token is available and consume it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class RateLimiter:
+    """Per-host token buckets shared by every thread issuing requests."""
+
+    def __init__(self, rate: float = REQUESTS_PER_SECOND, burst: float = RATE_LIMIT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def wait(self, url: str) -> None:
+        """Block until a request to the host of `url` is allowed."""
+        host = urllib.parse.urlsplit(url).netloc
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(self.rate, self.burst)
+        bucket.acquire()
+
+# Process-wide limiter so concurrent sessions share the portal's politeness budget
+RATE_LIMITER = RateLimiter()
+
+class AdaptiveLimit:
+    """AIMD limit on in-flight requests to one host, halved on errors or when a stage's latency climbs."""
+
+    def __init__(self, initial: float, maximum: float, minimum: float = 1):
+        self.limit = float(initial)
+        self.maximum = maximum
+        self.minimum = minimum
+        self.in_flight = 0
+        self.latency: Dict[str, float] = {}  # Fast EWMA of recent requests
+        self.baseline: Dict[str, float] = {}  # Slow EWMA, pulled down quickly by faster samples
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+
+    def acquire(self) -> None:
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, stage: str, latency: Optional[float], congested: bool) -> None:
+        with self.condition:
+            self.in_flight -= 1
+            if latency is not None:
+                recent = self.latency[stage] = 0.8 * self.latency.get(stage, latency) + 0.2 * latency
+                baseline = self.baseline.get(stage, latency)
+                weight = 0.5 if latency < baseline else 0.01
+                baseline = self.baseline[stage] = (1 - weight) * baseline + weight * latency
+                congested = congested or recent > LATENCY_TOLERANCE * baseline
+
+            now = time.monotonic()
+            if congested:
+                # One decrease per round trip, so a burst of failures does not collapse the limit
+                if now - self.last_decrease > max(self.latency.values(), default=0.1):
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self.last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+class ConcurrencyLimiter:
+    """Per-host adaptive limits on in-flight requests, shared by every thread."""
+
+    def __init__(self, initial: int = MAX_WORKERS, maximum: int = MAX_CONCURRENCY):
+        self.initial = initial
+        self.maximum = maximum
+        self.limits: Dict[str, AdaptiveLimit] = {}
+        self.lock = threading.Lock()
+
+    def for_url(self, url: str) -> AdaptiveLimit:
+        host = urllib.parse.urlsplit(url).netloc
+        with self.lock:
+            limit = self.limits.get(host)
+            if limit is None:
+                limit = self.limits[host] = AdaptiveLimit(self.initial, self.maximum)
+        return limit
+
+# Process-wide, like RATE_LIMITER, so every session backs off together
+CONCURRENCY_LIMITER = ConcurrencyLimiter()
+
+def retry_delay(attempt: int, response: Optional[requests.Response] = None) -> float:
+    """Return the delay before retry `attempt` (0-based): Retry-After if given, else jittered backoff."""
+    retry_after = response.headers.get('Retry-After', '') if response is not None else ''
+    if retry_after.isdigit():
+        return min(RETRY_BACKOFF_MAX, float(retry_after))
+    return min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+class ListingError(Exception):
+    """A listing page could not be read, so the links found are not the whole listing."""
+
 class ScraperSession:
-    def __init__(self):
+    def __init__(self, rate_limiter: Optional[RateLimiter] = None, cache: Optional[HttpCache] = None,
+                 use_cache: bool = True, metrics: Optional[Metrics] = None,
+                 concurrency: Optional[ConcurrencyLimiter] = None, retries: int = REQUEST_RETRIES):
+        self.rate_limiter = rate_limiter or RATE_LIMITER
+        self.concurrency = concurrency or CONCURRENCY_LIMITER
+        self.retries = retries
+        self.cache = (cache or get_http_cache()) if use_cache else None
+        self.metrics = metrics or METRICS
         self.session = requests.Session()
         self.session.headers.update(HEADERS)
-        self.session.get(BASE_URL)  # Initialize session with cookies
+        # Enough pooled connections for every in-flight request plus streamed bodies being read
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_CONCURRENCY + MAX_WORKERS)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.cookie_lock = threading.Lock()
+        self.cookies_refreshed_at: Optional[float] = None
+    
+    def cookies_expired(self) -> bool:
+        """Whether the session cookies were never fetched, are too old or have expired."""
+        if self.cookies_refreshed_at is None or time.monotonic() - self.cookies_refreshed_at > COOKIE_MAX_AGE:
+            return True
+        return any(cookie.is_expired() for cookie in self.session.cookies)
+    
+    def refresh_cookies(self, force: bool = False) -> None:
+        """Fetch fresh session cookies from the home page, once even when many threads ask."""
+        with self.cookie_lock:
+            if not force and not self.cookies_expired():
+                return
+            self.session.cookies.clear()
+            try:
+                self._send(BASE_URL, stage_for(BASE_URL)).close()
+            except Exception as e:
+                logger.error(f"Failed to refresh session cookies: {e}")
+            # Also after a failure, so a down portal is not hit twice per request; a rejection forces a retry
+            self.cookies_refreshed_at = time.monotonic()
+    
+    def close(self) -> None:
+        self.session.close()
+    
+    def get(self, url: str, revalidate: bool = False, **kwargs) -> requests.Response:
+        """GET a URL through the persistent cache; `revalidate` skips the freshness shortcut."""
+        stage = stage_for(url)
+        cacheable = self.cache is not None and not kwargs.get('stream') and 'headers' not in kwargs
+        entry = self.cache.lookup(url) if cacheable else None
+        if entry and entry['fresh'] and not revalidate:
+            self.metrics.inc('via_cache_lookups_total', stage=stage, result="hit")
+            return build_response(entry)
+        
+        if entry:
+            kwargs['headers'] = conditional_headers(entry)
+        
+        response = self._request(url, stage, "GET", **kwargs)
+        # Streamed bodies are not read here, so count what the server announced
+        size = response.headers.get('Content-Length') if kwargs.get('stream') else len(response.content)
+        if size is not None and str(size).isdigit():
+            self.metrics.inc('via_response_bytes_total', int(size), stage=stage)
+        
+        if entry and response.status_code == 304:
+            self.metrics.inc('via_cache_lookups_total', stage=stage, result="revalidated")
+            self.cache.revalidated(url)
+            return build_response(entry)
+        if cacheable:
+            self.metrics.inc('via_cache_lookups_total', stage=stage, result="miss")
+        if cacheable and response.status_code == 200:
+            self.cache.store(url, response)
+        return response
+    
+    def head(self, url: str, **kwargs) -> requests.Response:
+        """HEAD a URL (never cached): headers without transferring the body."""
+        return self._request(url, stage_for(url), "HEAD", **kwargs)
     
-    def get(self, url: str, **kwargs) -> requests.Response:
-        return self.session.get(url, **kwargs)
+    def _request(self, url: str, stage: str, method: str, **kwargs) -> requests.Response:
+        """Send a request with fresh cookies, once more with new cookies if rejected (HTTPError if again)."""
+        self.refresh_cookies()
+        response = self._send(url, stage, method, **kwargs)
+        if self._rejected(url, response):
+            logger.info(f"Session cookies rejected for {url}, refreshing them")
+            response.close()
+            self.refresh_cookies(force=True)
+            response = self._send(url, stage, method, **kwargs)
+            if self._rejected(url, response):
+                response.close()
+                raise requests.HTTPError(f"Portal rejected the session for {url}", response=response)
+        return response
+    
+    def _rejected(self, url: str, response: requests.Response) -> bool:
+        """Whether the portal refused the session or bounced the request back to its home page."""
+        if response.status_code in REJECTED_STATUSES:
+            return True
+        home = urllib.parse.urlsplit(BASE_URL).path.rstrip("/")
+        landed = urllib.parse.urlsplit(response.url).path.rstrip("/")
+        return bool(response.history) and landed in (home, f"{home}/it-IT") and urllib.parse.urlsplit(url).path.rstrip("/") != landed
+    
+    def _send(self, url: str, stage: str, method: str = "GET", **kwargs) -> requests.Response:
+        """Send a request within the host's adaptive concurrency limit, retrying transient failures."""
+        limit = self.concurrency.for_url(url)
+        for attempt in range(self.retries + 1):
+            self.rate_limiter.wait(url)
+            limit.acquire()
+            started = time.perf_counter()
+            response, error = None, None
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            finally:
+                latency = time.perf_counter() - started
+                congested = response is None or response.status_code in RETRY_STATUSES
+                # Failed requests say nothing about normal latency
+                limit.release(stage, None if congested else latency, congested)
+                self.metrics.set('via_concurrency_limit', limit.limit, host=urllib.parse.urlsplit(url).netloc)
+                self.metrics.observe('via_request_seconds', latency, stage=stage)
+                self.metrics.inc('via_requests_total', stage=stage,
+                                 status=str(response.status_code) if response is not None else "error")
+            
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                return response
+            if attempt == self.retries:
+                if error is not None:
+                    raise error
+                return response
+            
+            delay = retry_delay(attempt, response)
+            logger.warning(f"Retrying {url} in {delay:.1f}s after {error or response.status_code} "
+                           f"(attempt {attempt + 1} of {self.retries})")
+            if response is not None:
+                response.close()
+            self.metrics.inc('via_retries_total', stage=stage)
+            time.sleep(delay)
+
+class SessionPool:
+    """Process-wide pool of warm sessions reused by searches, jobs and UI sessions.
+
+    Sessions are leased exclusively so each run can record its own metrics;
+    their cookies and pooled connections carry over to the next lease.
+    """
+
+    def __init__(self, size: int = SESSION_POOL_SIZE):
+        self.size = size
+        self.idle: List[ScraperSession] = []
+        self.lock = threading.Lock()
+
+    def acquire(self, metrics: Optional[Metrics] = None) -> ScraperSession:
+        """Lease an idle session, or a new one when all are in use."""
+        with self.lock:
+            session = self.idle.pop() if self.idle else None
+        if session is None:
+            session = ScraperSession()
+        session.metrics = metrics or METRICS
+        return session
+
+    def release(self, session: ScraperSession) -> None:
+        """Return a leased session, keeping it for reuse unless the pool is full."""
+        session.metrics = METRICS
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append(session)
+                return
+        session.close()
+
+    @contextmanager
+    def lease(self, metrics: Optional[Metrics] = None) -> Iterator[ScraperSession]:
+        session = self.acquire(metrics)
+        try:
+            yield session
+        finally:
+            self.release(session)
+
+    def warm(self, count: int = 1) -> threading.Thread:
+        """Top the pool up to `count` idle sessions with fresh cookies, on a background thread."""
+        def fill() -> None:
+            with self.lock:
+                missing = min(count, self.size) - len(self.idle)
+            for _ in range(missing):
+                session = ScraperSession()
+                session.refresh_cookies()
+                self.release(session)
+
+        thread = threading.Thread(target=fill, name="session-pool-warm", daemon=True)
+        thread.start()
+        return thread
+
+_shared_pool: Optional[SessionPool] = None
+_shared_pool_lock = threading.Lock()
+
+def get_session_pool() -> SessionPool:
+    """Return the process-wide session pool."""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = SessionPool()
+        return _shared_pool
 
 def get_filename_from_response(response: requests.Response) -> str:
     """Extract filename from response headers or URL."""
@@ -48,9 +376,12 @@ def get_filename_from_response(response: requests.Response) -> str:
                 filename = filename_candidate
     
     if not filename:
-        filename = os.path.basename(urllib.parse.urlsplit(response.url).path)
+        url_parts = urllib.parse.urlsplit(response.url)
+        file_names = urllib.parse.parse_qs(url_parts.query).get('fileName')
+        filename = file_names[0].split('/')[-1] if file_names else os.path.basename(url_parts.path)
         if not filename:
-            filename = f"doc_{int(time.time())}.pdf"
+            # Stable per URL, so repeated downloads of the same document get the same name
+            filename = f"doc_{hashlib.sha1(response.url.encode()).hexdigest()[:12]}.pdf"
     
     if not os.path.splitext(filename)[1]:
         filename += ".pdf"
@@ -63,161 +394,338 @@ def get_project_info(project_url: str, session: ScraperSession) -> Dict:
         resp = session.get(project_url, timeout=10)
         resp.raise_for_status()
         
-        soup = BeautifulSoup(resp.text, "html.parser")
-        
-        # Initialize values
-        project_code = None
+        with session.metrics.timer('via_parse_seconds', stage="project"):
+            project_code = procedure_code(resp.text)  # 'Codice procedura' cell of the procedure table
+            title = project_title(resp.text)
+            details = info_fields(resp.text)
         folder_id = project_url.split('/')[-1]  # This is the folder ID from URL
         
-        # Find the procedure table
-        procedure_table = soup.find('table', class_='table')
-        if procedure_table:
-            rows = procedure_table.find_all('tr')
-            for row in rows:
-                cells = row.find_all('td')
-                if len(cells) >= 2:
-                    if 'Codice procedura' in cells[0].text:
-                        project_code = cells[1].text.strip()
-        
         return {
             'project_code': project_code,  # The actual project code (e.g., 12960)
             'folder_id': folder_id,        # The folder ID from URL (e.g., 11230)
-            'url': project_url
+            'url': project_url,
+            'title': title,                # The project's heading, for offline search
+            'details': details             # Label/value rows of the info table (Proponente, ...)
         }
         
     except Exception as e:
         logger.error(f"Failed to get project info for {project_url}: {e}")
         return None
 
-def get_projects(keyword: str) -> Tuple[List[str], ScraperSession]:
-    """Get all project URLs for a given keyword."""
-    scraper_session = ScraperSession()
-    all_project_links = []
-    current_page = 1
+def get_last_page_number(page: Page, param: str) -> Optional[int]:
+    """Read the highest page number linked from the page's `ul.pagination`."""
+    if page.pagination_hrefs is None:
+        return None
     
-    while True:
-        # Modified search URL to include more results per page
-        search_url = f"{BASE_URL}{SEARCH_ENDPOINT}?Testo={urllib.parse.quote(keyword)}&t=o&p={current_page}&ps=100"
-        logger.info(f"Searching page {current_page} with keyword='{keyword}'")
+    pages = []
+    for href in page.pagination_hrefs:
+        match = re.search(rf'[?&]{param}=(\d+)', href)
+        if match:
+            pages.append(int(match.group(1)))
+    return max(pages) if pages else None
 
+def fetch_page(url: str, session: ScraperSession, timeout: int, revalidate: bool = False) -> Page:
+    """Fetch a page for link extraction."""
+    resp = session.get(url, timeout=timeout, revalidate=revalidate)
+    resp.raise_for_status()
+    with session.metrics.timer('via_parse_seconds', stage=stage_for(url)):
+        page = Page(resp.text)
+        page.hrefs  # Extract while timed; every listing reads the anchors
+    return page
+
+def fetch_pages(urls: List[str], session: ScraperSession, timeout: int,
+                revalidate: bool = False) -> List[Optional[Page]]:
+    """Fetch several pages concurrently, returning them in the order given (None on failure)."""
+    def fetch(url: str) -> Optional[Page]:
         try:
-            resp = scraper_session.get(search_url, timeout=10)
-            resp.raise_for_status()
-            
-            soup = BeautifulSoup(resp.text, "html.parser")
-            project_links = [
-                urllib.parse.urljoin(BASE_URL, a["href"])
-                for a in soup.find_all("a", href=True)
-                if "/it-IT/Oggetti/Info/" in a["href"]
-            ]
+            return fetch_page(url, session, timeout, revalidate)
+        except Exception as e:
+            logger.error(f"Failed to fetch page {url}: {e}")
+            return None
+    
+    if not urls:
+        return []
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(urls))) as executor:
+        return list(executor.map(fetch, urls))
 
-            if not project_links:
+def listing_fingerprint(page: Page, links: List[str], param: str) -> str:
+    """Fingerprint a listing page by its extracted links and pagination, ignoring volatile markup."""
+    page_links = [href for href in page.hrefs if re.search(rf'[?&]{param}=\d', href)]
+    return hashlib.sha1("\n".join(links + page_links).encode()).hexdigest()
+
+def iter_paginated_links(
+    page_url: Callable[[int], str],
+    param: str,
+    extract_links: Callable[[Page], List[str]],
+    has_next_page: Callable[[Page, int], bool],
+    session: ScraperSession,
+    timeout: int,
+    parallel: bool = PARALLEL_PAGINATION,
+    delta_state: Optional[ProjectIndex] = None,
+    strict: bool = False,
+    revalidate: bool = False,
+) -> Iterator[str]:
+    """Yield links from every page of a paginated listing, in page order, as pages arrive.
+
+    With `delta_state`, an unchanged first page yields the links stored last time;
+    `revalidate` walks and revalidates every page regardless. A failed page ends
+    the listing, raising ListingError with `strict`.
+    """
+    all_links = []
+    current_page = 1
+    complete = True
+    conditional = revalidate or delta_state is not None
+    
+    try:
+        page = fetch_page(page_url(current_page), session, timeout, conditional)
+    except Exception as e:
+        logger.error(f"Failed to fetch page {current_page} of {page_url(1)}: {e}")
+        if strict:
+            raise ListingError(f"Failed to fetch {page_url(1)}") from e
+        return
+    
+    if delta_state is not None:
+        fingerprint = listing_fingerprint(page, extract_links(page), param)
+        previous = delta_state.get_listing(page_url(1))
+        if previous and previous[0] == fingerprint and not revalidate:
+            logger.info(f"First page of {page_url(1)} unchanged, reusing {len(previous[1])} known links")
+            yield from previous[1]
+            return
+    
+    while True:
+        links = extract_links(page)
+        if not links:
+            break
+        
+        all_links.extend(links)
+        logger.info(f"Found {len(links)} links on page {current_page}")
+        yield from links
+        
+        if not has_next_page(page, current_page):
+            break
+        
+        last_page = get_last_page_number(page, param) if parallel else None
+        if last_page is None or last_page <= current_page + 1:
+            current_page += 1
+            try:
+                page = fetch_page(page_url(current_page), session, timeout, conditional)
+            except Exception as e:
+                logger.error(f"Failed to fetch page {current_page} of {page_url(1)}: {e}")
+                complete = False
                 break
-                
-            all_project_links.extend(project_links)
-            logger.info(f"Found {len(project_links)} project links on page {current_page}")
-            
-            # Check for next page more thoroughly
-            pagination = soup.find('ul', class_='pagination')
-            if not pagination or not any(f"p={current_page + 1}" in a.get('href', '') for a in pagination.find_all('a')):
+            continue
+        
+        page_numbers = list(range(current_page + 1, last_page + 1))
+        logger.info(f"Fetching pages {page_numbers[0]}-{last_page} concurrently")
+        pages = fetch_pages([page_url(n) for n in page_numbers], session, timeout, conditional)
+        
+        # The last page is handled by the loop so a sliding pagination window keeps going
+        page = None
+        for number, next_page in zip(page_numbers, pages):
+            if next_page is None:
+                complete = False
                 break
-                
-            current_page += 1
-            time.sleep(DELAY_BETWEEN_REQUESTS)
-
-        except Exception as e:
-            logger.error(f"Failed to get projects on page {current_page}: {e}")
+            if number == last_page:
+                page = next_page
+                current_page = number
+                break
+            links = extract_links(next_page)
+            if not links:
+                break
+            all_links.extend(links)
+            logger.info(f"Found {len(links)} links on page {number}")
+            yield from links
+        
+        if page is None:
             break
+    
+    # A listing cut short by errors is not recorded, so the next run walks it again
+    if delta_state is not None and complete:
+        delta_state.set_listing(page_url(1), fingerprint, all_links)
+    if strict and not complete:
+        raise ListingError(f"Listing {page_url(1)} is incomplete")
+
+def iter_projects(keyword: str, session: ScraperSession, parallel: bool = PARALLEL_PAGINATION,
+                  delta_state: Optional[ProjectIndex] = None, strict: bool = False,
+                  revalidate: bool = False) -> Iterator[str]:
+    """Yield project URLs for a keyword as search result pages arrive."""
+    logger.info(f"Searching projects with keyword='{keyword}'")
+    
+    def page_url(page: int) -> str:
+        # Modified search URL to include more results per page
+        return f"{BASE_URL}{SEARCH_ENDPOINT}?Testo={urllib.parse.quote(keyword)}&t=o&p={page}&ps=100"
+    
+    def extract_links(page: Page) -> List[str]:
+        return [urllib.parse.urljoin(BASE_URL, href) for href in page.links_containing("/it-IT/Oggetti/Info/")]
+    
+    def has_next_page(page: Page, number: int) -> bool:
+        pagination = page.pagination_hrefs
+        return bool(pagination) and any(f"p={number + 1}" in href for href in pagination)
+    
+    return iter_paginated_links(
+        page_url, 'p', extract_links, has_next_page, session, timeout=10, parallel=parallel,
+        delta_state=delta_state, strict=strict, revalidate=revalidate
+    )
 
+def get_projects(keyword: str, parallel: bool = PARALLEL_PAGINATION,
+                 delta_state: Optional[ProjectIndex] = None) -> List[str]:
+    """Get all project URLs for a given keyword, searching on a session leased from the pool."""
+    with get_session_pool().lease() as scraper_session:
+        all_project_links = list(iter_projects(keyword, scraper_session, parallel, delta_state))
     logger.info(f"Total projects found: {len(all_project_links)}")
-    return all_project_links, scraper_session
+    return all_project_links
 
-def get_procedura_links(project_url: str, session: ScraperSession) -> List[str]:
-    """Get all procedure URLs for a given project."""
+def get_procedura_links(project_url: str, session: ScraperSession,
+                        delta_state: Optional[ProjectIndex] = None, strict: bool = False) -> List[str]:
+    """Get all procedure URLs for a given project (raising ListingError on failure with `strict`)."""
     logger.info(f"Parsing project page => {project_url}")
     
     try:
-        resp = session.get(project_url, timeout=10)
+        resp = session.get(project_url, timeout=10, revalidate=delta_state is not None)
         resp.raise_for_status()
 
-        soup = BeautifulSoup(resp.text, "html.parser")
-        procedura_links = [
-            urllib.parse.urljoin(project_url, a["href"])
-            for a in soup.find_all("a", href=True)
-            if "/it-IT/Oggetti/Documentazione/" in a["href"]
-        ]
+        with session.metrics.timer('via_parse_seconds', stage="project"):
+            page = Page(resp.text)
+            procedura_links = [
+                urllib.parse.urljoin(project_url, href)
+                for href in page.links_containing("/it-IT/Oggetti/Documentazione/")
+            ]
 
         logger.info(f"Found {len(procedura_links)} procedure links")
+        if delta_state is not None:
+            delta_state.set_listing(project_url, listing_fingerprint(page, procedura_links, 'pagina'), procedura_links)
         return procedura_links
 
     except Exception as e:
         logger.error(f"Failed to get procedure links for {project_url}: {e}")
+        if strict:
+            raise ListingError(f"Failed to read {project_url}") from e
         return []
 
-def get_document_links(procedura_url: str, session: ScraperSession) -> List[str]:
-    """Get all document URLs from a procedure page."""
-    all_doc_links = []
-    current_page = 1
+def iter_document_links(procedura_url: str, session: ScraperSession, parallel: bool = PARALLEL_PAGINATION,
+                        delta_state: Optional[ProjectIndex] = None, strict: bool = False,
+                        revalidate: bool = False) -> Iterator[str]:
+    """Yield document URLs from a procedure's pages as they arrive."""
+    logger.info(f"Parsing procedure page => {procedura_url}")
     
-    while True:
-        page_url = procedura_url if current_page == 1 else f"{procedura_url}?pagina={current_page}"
-        logger.info(f"Parsing procedure page {current_page}")
-        
-        try:
-            resp = session.get(page_url, timeout=30)
-            resp.raise_for_status()
-
-            soup = BeautifulSoup(resp.text, "html.parser")
-            doc_links = [
-                urllib.parse.urljoin(procedura_url, a["href"])
-                for a in soup.find_all("a", href=True)
-                if "/File/Documento/" in a["href"]
-            ]
+    def page_url(page: int) -> str:
+        return procedura_url if page == 1 else f"{procedura_url}?pagina={page}"
+    
+    def extract_links(page: Page) -> List[str]:
+        return [urllib.parse.urljoin(procedura_url, href) for href in page.links_containing("/File/Documento/")]
+    
+    def has_next_page(page: Page, number: int) -> bool:
+        return any(f"pagina={number + 1}" in href for href in page.hrefs)
+    
+    return iter_paginated_links(
+        page_url, 'pagina', extract_links, has_next_page, session, timeout=30, parallel=parallel,
+        delta_state=delta_state, strict=strict, revalidate=revalidate
+    )
 
-            if not doc_links:
-                break
-                
-            all_doc_links.extend(doc_links)
-            logger.info(f"Found {len(doc_links)} document links on page {current_page}")
-            
-            if not any(f"pagina={current_page + 1}" in a["href"] for a in soup.find_all("a", href=True)):
-                break
-                
-            current_page += 1
-            time.sleep(DELAY_BETWEEN_REQUESTS)
+def get_document_links(procedura_url: str, session: ScraperSession, parallel: bool = PARALLEL_PAGINATION,
+                       delta_state: Optional[ProjectIndex] = None, strict: bool = False,
+                       revalidate: bool = False) -> List[str]:
+    """Get all document URLs from a procedure page."""
+    return list(iter_document_links(procedura_url, session, parallel, delta_state, strict, revalidate))
 
-        except Exception as e:
-            logger.error(f"Failed to get documents on page {current_page}: {e}")
-            break
+def remote_size(response: requests.Response) -> Optional[int]:
+    """Return the full document size from Content-Range (ranged reply) or Content-Length."""
+    match = re.match(r"bytes \d+-\d+/(\d+)", response.headers.get('Content-Range', ''))
+    if match:
+        return int(match.group(1))
+    length = response.headers.get('Content-Length', '')
+    return int(length) if response.status_code == 200 and length.isdigit() else None
 
-    return all_doc_links
+def probe_document(doc_url: str, session: ScraperSession, timeout: int = 10) -> Optional[Dict]:
+    """Get a document's filename, size, type and modification date without downloading it.
 
-def get_document_metadata(doc_url: str, session: ScraperSession) -> Optional[Dict]:
-    """Get metadata for a document."""
+    Sends a HEAD, falling back to a `Range: bytes=0-0` GET when HEAD is refused
+    or announces no size. The connection goes back to the pool right away: the
+    one-byte body is read, and a server ignoring the range has its response closed.
+    """
     try:
-        response = session.get(doc_url, stream=True, timeout=10)
+        response = session.head(doc_url, timeout=timeout)
+        if response.status_code in PROBE_FALLBACK_STATUSES or (response.ok and remote_size(response) is None):
+            response.close()
+            response = session.get(doc_url, stream=True, timeout=timeout, headers={'Range': "bytes=0-0"})
+            with response:
+                if response.status_code == 206:
+                    response.content
         response.raise_for_status()
-        
-        filename = get_filename_from_response(response)
-        
         return {
             'url': doc_url,
-            'filename': filename,
-            'size': response.headers.get('Content-Length', 'Unknown'),
-            'type': response.headers.get('Content-Type', 'Unknown'),
-            'last_modified': response.headers.get('Last-Modified', 'Unknown')
+            'filename': get_filename_from_response(response),
+            'size': remote_size(response),
+            'type': response.headers.get('Content-Type'),
+            'last_modified': response.headers.get('Last-Modified'),
         }
-        
     except Exception as e:
-        logger.error(f"Failed to get document metadata for {doc_url}: {e}")
+        logger.error(f"Failed to probe document {doc_url}: {e}")
+        return None
+
+def get_document_metadata(doc_url: str, session: ScraperSession) -> Optional[Dict]:
+    """Get metadata for a document (see `probe_document`; missing fields read 'Unknown')."""
+    metadata = probe_document(doc_url, session)
+    if metadata is None:
         return None
+    return {key: 'Unknown' if value is None else value for key, value in metadata.items()}
 
 def download_document(doc_url: str, session: ScraperSession) -> Optional[bytes]:
-    """Download a document and return its content."""
+    """Download a document and return its content.
+
+    The whole body is held in memory; use `download_document_to_file` or
+    `write_document_to_zip` for large documents.
+    """
     try:
-        response = session.get(doc_url, stream=True, timeout=30)
-        response.raise_for_status()
-        return response.content
+        with session.get(doc_url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            return response.content
+    except Exception as e:
+        logger.error(f"Failed to download document {doc_url}: {e}")
+        return None
+
+def download_document_to_file(doc_url: str, session: ScraperSession, dest_folder: str = DOWNLOAD_FOLDER,
+                              chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> Optional[str]:
+    """Stream a document to disk chunk by chunk and return the saved path."""
+    try:
+        with session.get(doc_url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            
+            os.makedirs(dest_folder, exist_ok=True)
+            path = os.path.join(dest_folder, get_filename_from_response(response))
+            part_path = path + ".part"
+            with open(part_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    f.write(chunk)
+            os.replace(part_path, path)
+            return path
     except Exception as e:
         logger.error(f"Failed to download document {doc_url}: {e}")
-        return None
\ No newline at end of file
+        return None
+
+def compression_for(filename: str) -> int:
+    """Return the ZIP compression for a file: stored if already compressed, deflated otherwise."""
+    return zipfile.ZIP_STORED if os.path.splitext(filename)[1].lower() in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+def zip_entry_info(arcname: str) -> zipfile.ZipInfo:
+    """Describe a new ZIP entry with the compression chosen by `compression_for`."""
+    info = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+    info.compress_type = compression_for(arcname)
+    info.external_attr = 0o644 << 16
+    return info
+
+def write_document_to_zip(zipf: zipfile.ZipFile, doc_url: str, session: ScraperSession, prefix: str = "",
+                          chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> Optional[str]:
+    """Stream a document into a new ZIP entry and return the entry name."""
+    try:
+        with session.get(doc_url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            
+            arcname = f"{prefix}{get_filename_from_response(response)}"
+            with zipf.open(zip_entry_info(arcname), "w", force_zip64=True) as entry:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    entry.write(chunk)
+            return arcname
+    except Exception as e:
+        logger.error(f"Failed to add document {doc_url} to archive: {e}")
+        return None
@@ -3,53 +3,56 @@ import os
 import re
 import requests
 from scraper import (
-    get_project_info,
     get_projects, 
-    get_procedura_links, 
-    get_document_links,
+    iter_projects,
     HEADERS,  # Import constants from scraper
     BASE_URL,
-    ScraperSession
+    get_session_pool,
+    write_document_to_zip,
+    compression_for
 )
+from crawler import find_project_by_code, iter_crawl
+from doc_store import get_document_store
+from downloads import DownloadManager, job_folder_for
+from jobs import JobQueue
+from metrics import METRICS, Metrics
+from project_index import folder_id_from_url, get_project_index
+from results import ResultStore, page_count, title_for
+from scheduler import get_cache_warmer
 import time
 import base64
+import itertools
 import zipfile
 from datetime import datetime
-from bs4 import BeautifulSoup
-from urllib.parse import unquote
 
 # Initialize session state
 if 'search_results' not in st.session_state:
-    st.session_state['search_results'] = None
+    st.session_state['search_results'] = None  # ResultStore of the last live search
+if 'search_summary' not in st.session_state:
+    st.session_state['search_summary'] = None
 if 'current_page' not in st.session_state:
     st.session_state['current_page'] = 1
-if 'available_documents' not in st.session_state:
-    st.session_state['available_documents'] = []
-if 'scraper_session' not in st.session_state:
-    st.session_state['scraper_session'] = ScraperSession()
+
+@st.cache_resource
+def warm_session_pool():
+    # Searches lease warm sessions from the process-wide pool instead of holding one per browser session;
+    # warmed once per server process, not on every rerun
+    return get_session_pool().warm()
+
+warm_session_pool()
 
 # Cached functions for expensive operations
 @st.cache_data(ttl=3600)  # Cache for 1 hour
 def fetch_projects(keyword, max_projects):
-    project_urls, _ = get_projects(keyword)
+    project_urls = get_projects(keyword)
     if max_projects > 0:
         project_urls = project_urls[:max_projects]
     return project_urls
 
-@st.cache_data(ttl=3600)
-def fetch_documents(project_url, _session):
-    procedure_urls = get_procedura_links(project_url, _session)
-    documents = []
-    for proc_url in procedure_urls:
-        doc_urls = get_document_links(proc_url, _session)
-        for doc_url in doc_urls:
-            documents.append({
-                'url': doc_url,
-                'project_url': project_url,
-                'procedure_url': proc_url,
-                'date_found': time.strftime('%Y-%m-%d %H:%M:%S')
-            })
-    return documents, len(procedure_urls)
+@st.cache_resource
+def refresh_queue():
+    # One background crawl queue per server process; finished projects update the local index
+    return JobQueue()
 
 @st.cache_data(ttl=600)  # Cache for 10 minutes
 def create_zip_of_documents(documents, _session):
@@ -58,31 +61,135 @@ def create_zip_of_documents(documents, _session):
     
     with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
         for idx, doc in enumerate(documents):
-            try:
-                response = _session.get(doc['url'], stream=True)
-                response.raise_for_status()
-                
-                filename = None
-                content_disposition = response.headers.get('Content-Disposition')
-                if content_disposition:
-                    import re
-                    matches = re.findall('filename=(.+)', content_disposition)
-                    if matches:
-                        filename = matches[0].strip('"')
-                
-                if not filename:
-                    filename = unquote(doc['url'].split('fileName=')[-1]) if 'fileName=' in doc['url'] else doc['url'].split('/')[-1]
-                
-                zipf.writestr(filename, response.content)
-                time.sleep(0.5)  # Be nice to the server
-                
-            except Exception as e:
-                st.warning(f"Failed to download {doc['url']}: {str(e)}")
-                continue
+            if not write_document_to_zip(zipf, doc['url'], _session):
+                st.warning(f"Failed to download {doc['url']}")
     
     return zip_path
 
 
+def reset_page():
+    st.session_state['current_page'] = 1
+
+def select_project(results):
+    # Count a view once per selection, not on every rerun of the page
+    reset_page()
+    folder_id = st.session_state['results_project']
+    for project_url in results.project_urls:
+        if folder_id and folder_id_from_url(project_url) == folder_id:
+            get_cache_warmer().record_project_view(project_url)
+            break
+
+def move_page(step, pages):
+    st.session_state['current_page'] = min(max(st.session_state['current_page'] + step, 1), pages)
+
+def markdown_cell(text):
+    return text.replace("|", "\\|").replace("[", "\\[").replace("]", "\\]")
+
+def page_table(results, rows, page):
+    """Return one page of `rows` as a markdown table."""
+    lines = ["| Document | Project | Procedure | Found |", "| --- | --- | --- | --- |"]
+    for doc in results.page(rows, page):
+        lines.append(
+            f"| [{markdown_cell(title_for(doc['url'], doc['title']))}]({doc['url']}) "
+            f"| [{folder_id_from_url(doc['project_url'])}]({doc['project_url']}) "
+            f"| [{markdown_cell(doc['procedure_url'].split('/Oggetti/')[-1])}]({doc['procedure_url']}) "
+            f"| {doc['date_found']} |"
+        )
+    return "\n".join(lines)
+
+def render_results(results, summary):
+    """Show the last live search, materializing only the documents on the current page."""
+    st.success(f"""
+    Search completed successfully!
+    - Projects processed: {summary['projects']}
+    - Total procedures found: {summary['procedures']}
+    - Total documents available: {len(results)}
+    """)
+    with st.expander("Crawl metrics"):
+        st.table(summary['metrics'])
+    if not len(results):
+        return
+
+    st.markdown("---")
+    counts = results.project_counts()
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        text = st.text_input("Filter documents by title:", key="results_filter", on_change=reset_page)
+    with col2:
+        folder_id = st.selectbox(
+            "Project:",
+            [""] + list(counts),
+            format_func=lambda folder_id: f"Project {folder_id} ({counts[folder_id]} documents)" if folder_id else "All projects",
+            key="results_project",
+            on_change=select_project,
+            args=(results,)
+        )
+    rows = results.filter(text, folder_id)
+    pages = page_count(len(rows))
+    page = min(st.session_state['current_page'], pages)
+
+    if folder_id and rows:
+        project_info = results.project_info[results.project_ids[rows[0]]] or {}
+        st.markdown(f"""
+        ### Project Information
+        - **Folder ID:** {folder_id}
+        - **Project Code:** {project_info.get('project_code')}
+        - **Number of Documents:** {counts[folder_id]}
+        """)
+
+    st.write(f"{len(rows)} matching documents. Click on the links to open documents in a new tab:")
+    st.markdown(page_table(results, rows, page))
+
+    # Navigation buttons
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        st.button("◀ Previous", on_click=move_page, args=(-1, pages), disabled=page <= 1)
+    with col2:
+        st.markdown(f"Page {page} of {pages}")
+    with col3:
+        st.button("Next ▶", on_click=move_page, args=(1, pages), disabled=page >= pages)
+
+    st.markdown("---")
+    if st.button("Download All Documents"):
+        try:
+            with st.spinner("Creating zip file of all documents..."), get_session_pool().lease() as scraper_session:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                zip_path = f"downloads/all_documents_{timestamp}.zip"
+                
+                # Documents land in a per-job folder with a manifest, so a rerun
+                # only fetches what is still missing; the shared document store
+                # supplies anything an earlier search already downloaded
+                doc_urls = results.urls
+                store = get_document_store()
+                manager = DownloadManager(job_folder_for(doc_urls), scraper_session, store=store)
+                progress_bar = st.progress(0)
+                summary = manager.run(
+                    doc_urls,
+                    progress_callback=lambda done, total: progress_bar.progress(done / total)
+                )
+                if summary['failed']:
+                    st.warning(f"{summary['failed']} documents could not be downloaded")
+                
+                # One folder per project, linked from the store, mirrored in the zip
+                view = store.build_view(list(results), manager.dest_folder)
+                with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                    for path in view.values():
+                        zipf.write(path, arcname=os.path.relpath(path, manager.dest_folder),
+                                   compress_type=compression_for(path))
+                
+                # Offer download of zip file
+                with open(zip_path, "rb") as fp:
+                    st.download_button(
+                        label="Download ZIP File",
+                        data=fp,
+                        file_name=os.path.basename(zip_path),
+                        mime="application/zip"
+                    )
+                
+                st.success("All documents have been zipped successfully! Click the button above to download.")
+                
+        except Exception as e:
+            st.error(f"Failed to create zip file: {str(e)}")
 
 # Page config
 st.set_page_config(
@@ -128,196 +235,123 @@ with st.form("search_form"):
             min_value=0, 
             value=0
         )
+    with col4:
+        search_source = st.radio(
+            "Search in:",
+            ["Live portal", "Local index"],
+            help="The local index answers instantly from projects and documents crawled before"
+        )
+        refresh_index = st.checkbox(
+            "Refresh from the portal in the background",
+            help="With the local index, also crawl the keyword on the portal so the next search is up to date"
+        )
     
     submit_button = st.form_submit_button("Run Scraper")
 
-if submit_button:
+if submit_button and search_source == "Local index":
+    if not keyword.strip():
+        st.error("Please enter a keyword to search the local index.")
+    else:
+        get_cache_warmer().record_search(keyword)
+        started = time.perf_counter()
+        results = get_project_index().search(keyword)
+        st.caption(f"{len(results)} indexed projects matched in {(time.perf_counter() - started) * 1000:.1f} ms")
+        if refresh_index:
+            job = refresh_queue().submit(keyword)
+            st.info(f"Refreshing '{keyword}' from the portal in the background (job {job.id[:8]}, {job.status}).")
+        if not results:
+            st.warning("No indexed projects match. Search the live portal to add them to the index.")
+        for result in results:
+            label = result['title'] or f"Project {result['folder_id']}"
+            with st.expander(f"{label} ({result['document_matches']} matching documents)"):
+                st.markdown(f"""
+                - **Folder ID:** {result['folder_id']}
+                - **Project Code:** {result['project_code']}
+                - **Page:** {result['url'] or 'not crawled yet'}
+                """)
+                for label, value in result['details'].items():
+                    st.markdown(f"- **{label}:** {value}")
+                for doc in result['documents']:
+                    st.markdown(f"- [{doc['title'] or doc['filename'] or doc['doc_id']}]({doc['url']})")
+
+elif submit_button:
     if not keyword.strip() and not search_id.strip():
         st.error("Please enter either a keyword or an ID.")
     else:
+        # Record this run's requests separately; the totals still reach the process-wide registry
+        run_metrics = Metrics(parent=METRICS)
+        scraper_session = get_session_pool().acquire(run_metrics)
         try:
             with st.spinner("Searching for projects..."):
                 if search_id:
                     if id_type == "Folder ID":
                         project_urls = [f"{BASE_URL}/it-IT/Oggetti/Info/{search_id.strip()}"]
                     else:  # Project Code
-                        all_projects = fetch_projects(keyword if keyword else "", 0)
-                        project_urls = []
-                        for proj_url in all_projects:
-                            info = get_project_info(proj_url, st.session_state.scraper_session)
-                            if info and info['project_code'] == search_id.strip():
-                                project_urls.append(proj_url)
-                                break
+                        # The local index answers known codes; the portal is only scanned on a miss
+                        project = get_project_index().find_by_code(search_id.strip())
+                        if not project:
+                            project = find_project_by_code(
+                                search_id.strip(),
+                                fetch_projects(keyword if keyword else "", 0),
+                                scraper_session,
+                                index=get_project_index()
+                            )
+                        project_urls = [project['url']] if project else []
+                    for project_url in project_urls:
+                        get_cache_warmer().record_project_view(project_url)
                 else:
-                    # Get projects using cached function
-                    st.info("Fetching projects... This might take a while for large searches.")
-                    project_urls = fetch_projects(keyword, max_projects)
-                
-                if not project_urls:
-                    st.warning("No projects found.")
-                    st.stop()
-                
-                if max_projects > 0:
-                    project_urls = project_urls[:max_projects]
-                    st.info(f"Processing first {max_projects} projects as requested")
+                    get_cache_warmer().record_search(keyword)
+                    # Project URLs stream in from the search pages while the crawl runs
+                    st.info("Fetching projects... Results appear below as each project is crawled.")
+                    project_urls = iter_projects(keyword, scraper_session)
+                    if max_projects > 0:
+                        project_urls = itertools.islice(project_urls, max_projects)
+                        st.info(f"Processing first {max_projects} projects as requested")
                 
-                # Use the session from session state
-                scraper_session = st.session_state.scraper_session
-                
-                st.success(f"Found {len(project_urls)} projects")
-                
-                # Process projects
-                progress_bar = st.progress(0)
+                # Documents go into a columnar store kept across reruns; while crawling,
+                # the first page is redrawn as records arrive, and the results view below
+                # pages through the whole store once the crawl ends
                 status_text = st.empty()
+                page_placeholder = st.empty()
+                results = ResultStore()
+                st.session_state['search_results'] = None
+                st.session_state['current_page'] = 1
                 
+                total_projects = 0
                 total_procedures = 0
-                available_documents = []
                 
-                for i, project_url in enumerate(project_urls):
-                    progress = (i + 1) / len(project_urls)
-                    progress_bar.progress(progress)
-                    status_text.text(f"Processing project {i+1}/{len(project_urls)}")
-                    
-                    try:
-                        docs, proc_count = fetch_documents(project_url, scraper_session)
-                        available_documents.extend(docs)
-                        total_procedures += proc_count
-                    except Exception as e:
-                        st.warning(f"Error processing project {project_url}: {str(e)}")
-                        continue
-
-                # Show results
-                progress_bar.empty()
+                # Projects, procedures and document titles are crawled concurrently on the shared session
+                for record in iter_crawl(project_urls, scraper_session, index=get_project_index(), with_titles=True):
+                    if record['type'] == 'project':
+                        results.add_project(record['project_url'], record['project_info'])
+                    elif record['type'] == 'document':
+                        results.add(record)
+                    elif record['type'] == 'project_done':
+                        total_projects += 1
+                        total_procedures += len(record['result']['procedure_urls'])
+                    # Refresh the status line and first page per project and every few documents, not on every record
+                    if record['type'] != 'document' or len(results) % 100 == 0:
+                        status_text.text(f"Processed {total_projects} projects, found {len(results)} documents so far...")
+                        if len(results):
+                            page_placeholder.markdown(page_table(results, range(len(results)), 1))
+                
                 status_text.empty()
-                st.success(f"""
-                Search completed successfully!
-                - Projects processed: {len(project_urls)}
-                - Total procedures found: {total_procedures}
-                - Total documents available: {len(available_documents)}
-                """)
+                page_placeholder.empty()
+                if not total_projects:
+                    st.warning("No projects found.")
+                    st.stop()
 
-                # Display documents with pagination
-                if available_documents:
-                    st.write("Click on the links to open documents in a new tab:")
-                    
-                    # Create a container for all documents
-                    doc_container = st.container()
-                    
-                    with doc_container:
-                        # Group documents by project
-                        project_documents = {}
-                        for doc in available_documents:
-                            project_id = doc['project_url'].split('/')[-1]
-                            if project_id not in project_documents:
-                                project_documents[project_id] = []
-                            project_documents[project_id].append(doc)
-                        
-                        # Display documents grouped by project
-                        # Display documents grouped by project
-                        for project_id, docs in project_documents.items():
-                            project_info = get_project_info(docs[0]['project_url'], st.session_state.scraper_session)
-                            
-                            with st.expander(f"Project {project_info['folder_id']} ({len(docs)} documents)", expanded=True):
-                                st.markdown(f"""
-                                ### Project Information
-                                - **Folder ID:** {project_info['folder_id']}
-                                - **Project Code:** {project_info['project_code']}
-                                - **Number of Documents:** {len(docs)}
-                                """)
-                                
-                                for doc in docs:
-                                    try:
-                                        doc_id = doc['url'].split('/')[-1]
-                                        metadata_url = f"{BASE_URL}/it-IT/Oggetti/MetadatoDocumento/{doc_id}"
-                                        metadata_response = st.session_state.scraper_session.get(metadata_url)
-                                        metadata_response.raise_for_status()
-                                        
-                                        soup = BeautifulSoup(metadata_response.text, 'html.parser')
-                                        doc_title_element = soup.find('td', text='Documento')
-                                        
-                                        if doc_title_element and doc_title_element.find_next('td'):
-                                            doc_title = doc_title_element.find_next('td').text.strip()
-                                            st.markdown(f"""
-                                            - [{doc_title}]({doc['url']})
-                                            - Project: [{doc['project_url']}]({doc['project_url']})
-                                            - Procedure: [{doc['procedure_url']}]({doc['procedure_url']})
-                                            ---
-                                            """)
-                                        else:
-                                            raise ValueError("Document title not found")
-                                            
-                                    except Exception as e:
-                                        # Fallback to simple display if metadata fetch fails
-                                        filename = unquote(doc['url'].split('fileName=')[-1]) if 'fileName=' in doc['url'] else doc['url'].split('/')[-1]
-                                        st.markdown(f"""
-                                        - [{filename}]({doc['url']})
-                                        - Project: [{doc['project_url']}]({doc['project_url']})
-                                        - Procedure: [{doc['procedure_url']}]({doc['procedure_url']})
-                                        ---
-                                        """)
-                    
-                    # Download section
-                    st.markdown("---")
-                    if available_documents:
-                        st.write("Click on the links to open documents in a new tab:")
-                        
-                        # Add download all button at the top
-                        if st.button("Download All Documents"):
-                            try:
-                                with st.spinner("Creating zip file of all documents..."):
-                                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                                    zip_path = f"downloads/all_documents_{timestamp}.zip"
-                                    
-                                    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                                        progress_bar = st.progress(0)
-                                        for idx, doc in enumerate(available_documents):
-                                            try:
-                                                response = st.session_state.scraper_session.get(doc['url'], stream=True)
-                                                response.raise_for_status()
-                                                
-                                                # Get filename from URL or content disposition
-                                                filename = None
-                                                content_disposition = response.headers.get('Content-Disposition')
-                                                if content_disposition:
-                                                    matches = re.findall('filename=(.+)', content_disposition)
-                                                    if matches:
-                                                        filename = matches[0].strip('"')
-                                                
-                                                if not filename:
-                                                    filename = unquote(doc['url'].split('fileName=')[-1]) if 'fileName=' in doc['url'] else doc['url'].split('/')[-1]
-                                                
-                                                # Add project ID prefix to filename to organize files
-                                                project_id = doc['project_url'].split('/')[-1]
-                                                filename = f"{project_id}_{filename}"
-                                                
-                                                zipf.writestr(filename, response.content)
-                                                
-                                                # Update progress
-                                                progress = (idx + 1) / len(available_documents)
-                                                progress_bar.progress(progress)
-                                                time.sleep(0.5)  # Be nice to the server
-                                                
-                                            except Exception as e:
-                                                st.warning(f"Failed to download {doc['url']}: {str(e)}")
-                                                continue
-                                    
-                                    # Offer download of zip file
-                                    with open(zip_path, "rb") as fp:
-                                        btn = st.download_button(
-                                            label="Download ZIP File",
-                                            data=fp,
-                                            file_name=os.path.basename(zip_path),
-                                            mime="application/zip"
-                                        )
-                                    
-                                    st.success("All documents have been zipped successfully! Click the button above to download.")
-                                    
-                            except Exception as e:
-                                st.error(f"Failed to create zip file: {str(e)}")
-                    
-                    # Navigation buttons
-                    col1, col2, col3 = st.columns([1, 2, 1])
-       
+                st.session_state['search_results'] = results
+                st.session_state['search_summary'] = {
+                    'projects': total_projects,
+                    'procedures': total_procedures,
+                    'metrics': run_metrics.summary(),
+                }
                     
         except Exception as e:
-            st.error(f"An error occurred: {str(e)}")
\ No newline at end of file
+            st.error(f"An error occurred: {str(e)}")
+        finally:
+            get_session_pool().release(scraper_session)
+
+if st.session_state['search_results'] is not None and search_source == "Live portal":
+    render_results(st.session_state['search_results'], st.session_state['search_summary'])